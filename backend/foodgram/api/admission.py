@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class SlotLimiter:
+    """
+    Общий для всех процессов машины предел одновременных запросов.
+    Слот - файл в каталоге directory, занятый слот - файл под flock.
+    Блокировку снимает ядро при завершении процесса, поэтому упавший
+    воркер слотов не удерживает. Потоки одного процесса делят открытые
+    файлы, и flock их не различает, поэтому занятые процессом слоты
+    дополнительно отмечаются в held.
+    """
+
+    def __init__(self, directory, size):
+        self.directory = directory
+        self.size = size
+        self.lock = threading.Lock()
+        self.pid = None
+        self.files = []
+
+    def open(self):
+        """
+        Файлы открываются заново в каждом процессе: после fork
+        унаследованные дескрипторы делили бы блокировку с родителем.
+        """
+        for descriptor in self.files:
+            os.close(descriptor)
+        os.makedirs(self.directory, exist_ok=True)
+        self.files = [
+            os.open(os.path.join(self.directory, f'slot_{number}'),
+                    os.O_RDWR | os.O_CREAT, 0o600)
+            for number in range(self.size)
+        ]
+        self.held = set()
+        self.pid = os.getpid()
+        self.next = self.pid % self.size
+
+    def acquire(self):
+        """Номер занятого слота или None, если свободных слотов нет."""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.open()
+            for offset in range(self.size):
+                slot = (self.next + offset) % self.size
+                if slot in self.held:
+                    continue
+                try:
+                    fcntl.flock(self.files[slot],
+                                fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                self.held.add(slot)
+                self.next = (slot + 1) % self.size
+                return slot
+        return None
+
+    def release(self, slot):
+        with self.lock:
+            fcntl.flock(self.files[slot], fcntl.LOCK_UN)
+            self.held.discard(slot)
+
+
+class SlotRelease:
+    """
+    Освобождает слот при закрытии ответа. Тело потокового ответа
+    формируется уже после выхода из middleware, пока его читает
+    сервер, поэтому слот должен оставаться занятым до close().
+    """
+
+    def __init__(self, limiter, slot):
+        self.limiter = limiter
+        self.slot = slot
+
+    def close(self):
+        if self.slot is not None:
+            self.limiter.release(self.slot)
+            self.slot = None
+
+
+def queue_time(header):
+    """
+    Сколько секунд запрос ждал после приёма прокси. Заголовок
+    X-Request-Start выставляет nginx в виде t=<секунды.миллисекунды>;
+    без заголовка или с неверным значением возвращается 0.
+    """
+    if not header:
+        return 0.0
+    try:
+        started = float(header.rpartition('=')[2])
+    except ValueError:
+        return 0.0
+    return max(time.time() - started, 0.0)
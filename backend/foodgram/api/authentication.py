@@ -0,0 +1,124 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.caching import shared_cache
+from foodgram.settings import (AUTH_CACHE_ALIAS, AUTH_CACHE_FIELDS,
+                               AUTH_CACHE_TIMEOUT, AUTH_LOCAL_CACHE_SIZE,
+                               AUTH_LOCAL_CACHE_TTL)
+
+User = get_user_model()
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш ограниченного размера с временем жизни."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.data[key]
+                return None
+            self.data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self.lock:
+            self.data[key] = (time.monotonic() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+
+local_tokens = LRUCache(AUTH_LOCAL_CACHE_SIZE, AUTH_LOCAL_CACHE_TTL)
+
+
+def token_cache_key(key):
+    return f'auth:token:{key}'
+
+
+def invalidate_tokens(keys):
+    """Удаляет снимки пользователей по ключам токенов из обоих кэшей."""
+    keys = list(keys)
+    for key in keys:
+        local_tokens.delete(key)
+    cache = shared_cache(AUTH_CACHE_ALIAS)
+    if cache is not None:
+        cache.delete_many([token_cache_key(key) for key in keys])
+
+
+def user_snapshot(user):
+    """
+    Поля AUTH_CACHE_FIELDS в порядке полей модели: их читают проверки
+    прав и сериализаторы пользователя. Остальные поля (и хэш пароля)
+    в кэш не попадают и при обращении догружаются из базы как отложенные.
+    """
+    return {field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+            if field.attname in AUTH_CACHE_FIELDS}
+
+
+def user_from_snapshot(snapshot):
+    return User.from_db(router.db_for_read(User), list(snapshot),
+                        list(snapshot.values()))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшированием снимка пользователя.
+
+    Снимок ищется в локальном LRU-кэше процесса, затем в общем кэше
+    (AUTH_CACHE_ALIAS) и только потом в базе данных. Каждый запрос
+    получает свой экземпляр пользователя, собранный из снимка. Общий кэш
+    очищается после фиксации выхода, смены пароля и сохранения
+    пользователя; локальный живёт не дольше AUTH_LOCAL_CACHE_TTL секунд.
+    Если AUTH_CACHE_ALIAS - локальный кэш процесса, общий уровень не
+    используется: сброс не дошёл бы до других воркеров.
+    """
+
+    def authenticate_credentials(self, key):
+        snapshot = local_tokens.get(key)
+        if snapshot is None:
+            cache = shared_cache(AUTH_CACHE_ALIAS)
+            if cache is not None:
+                snapshot = cache.get(token_cache_key(key))
+            if snapshot is None:
+                try:
+                    token = Token.objects.using(
+                        DEFAULT_DB_ALIAS).select_related('user').get(key=key)
+                except Token.DoesNotExist:
+                    raise exceptions.AuthenticationFailed(
+                        _('Invalid token.'))
+                snapshot = user_snapshot(token.user)
+                if cache is not None:
+                    cache.set(token_cache_key(key), snapshot,
+                              AUTH_CACHE_TIMEOUT)
+            local_tokens.set(key, snapshot)
+
+        user = user_from_snapshot(snapshot)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
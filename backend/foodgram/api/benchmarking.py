@@ -0,0 +1,345 @@
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.deletion import enqueue_recipe_deletion
+from api.metrics import QueryStats
+from api.parsers import NDJSONParser
+from api.views import RecipeViewSet
+from recipes.models import (ChangeLog, DeletionJob, Favorite, Ingredient,
+                            Recipe, RecipeDocument, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+BENCHMARK_SEED = 20220916
+
+ANON = 'anon'
+USER = 'user'
+ADMIN = 'admin'
+
+ROUTES = (
+    ('users-list', '/api/users/', (ANON, USER)),
+    ('users-detail', '/api/users/{author}/', (USER,)),
+    ('users-me', '/api/users/me/', (USER,)),
+    ('users-state', '/api/users/me/state/', (USER,)),
+    ('users-subscriptions', '/api/users/subscriptions/', (USER,)),
+    ('users-recommendations', '/api/users/recommendations/', (USER,)),
+    ('tags-list', '/api/tags/', (ANON, USER)),
+    ('tags-detail', '/api/tags/{tag}/', (ANON,)),
+    ('ingredients-list', '/api/ingredients/', (ANON, USER)),
+    ('ingredients-search', '/api/ingredients/?name=%D0%B0%D0%B1', (ANON,)),
+    ('ingredients-detail', '/api/ingredients/{ingredient}/', (ANON,)),
+    ('recipes-list', '/api/recipes/', (ANON, USER)),
+    ('recipes-list-tags', '/api/recipes/?tags=breakfast&tags=dinner',
+     (ANON, USER)),
+    ('recipes-list-favorited', '/api/recipes/?is_favorited=1', (USER,)),
+    ('recipes-list-author', '/api/recipes/?author={author}', (ANON,)),
+    ('recipes-detail', '/api/recipes/{recipe}/', (ANON, USER)),
+    ('recipes-download-shopping-cart',
+     '/api/recipes/download_shopping_cart/', (USER,)),
+    ('recipes-export', '/api/recipes/export/', (ADMIN,)),
+    ('sync', '/api/sync/?cursor=0', (USER,)),
+    ('deletions-list', '/api/deletions/', (USER, ADMIN)),
+    ('deletions-detail', '/api/deletions/{job}/', (USER,)),
+)
+
+# Изменяющие запросы: (имя, метод, адрес, тело, отмена, режимы), где
+# отмена - пара (метод, тело) запроса к тому же адресу. Отмена выполняется
+# перед каждым замеряемым запросом и в замер не входит, поэтому каждый
+# запрос работает с одним и тем же состоянием базы. Запросы без отмены
+# (создание, импорт, постановка удаления в очередь) каждый раз добавляют
+# новые строки.
+WRITE_ROUTES = (
+    ('recipes-create', 'post', '/api/recipes/', 'recipe', None, (USER,)),
+    ('recipes-import', 'post', '/api/recipes/import/', 'import', None,
+     (ADMIN,)),
+    ('recipes-delete-batch', 'post', '/api/recipes/delete/', 'deletion',
+     None, (ADMIN,)),
+    ('recipes-favorite', 'post', '/api/recipes/{recipe}/favorite/',
+     None, ('delete', None), (USER,)),
+    ('recipes-shopping-cart', 'post',
+     '/api/recipes/{recipe}/shopping_cart/', None, ('delete', None),
+     (USER,)),
+    ('recipes-favorite-batch', 'post', '/api/recipes/favorite/',
+     'add_recipe', ('post', 'remove_recipe'), (USER,)),
+    ('recipes-shopping-cart-batch', 'post', '/api/recipes/shopping_cart/',
+     'add_recipe', ('post', 'remove_recipe'), (USER,)),
+    ('users-subscribe-batch', 'post', '/api/users/subscribe/',
+     'add_author', ('post', 'remove_author'), (USER,)),
+)
+
+LARGE_TABLES = {
+    model._meta.db_table for model in (
+        User, Token, Follow, Recipe, Recipe.tags.through, RecipeIngredient,
+        RecipeDocument, Favorite, ShoppingCart, ChangeLog)
+}
+# Полная выгрузка читает таблицы целиком по определению.
+FULL_SCAN_ROUTES = {'recipes-export'}
+
+BENCHMARK_IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+
+
+@contextmanager
+def temporary_database():
+    """
+    Создаёт пустую тестовую базу (как test runner Django), переключает на
+    неё соединение и удаляет её на выходе. Файлы пишутся во временный
+    MEDIA_ROOT, чтобы не засорять рабочий каталог. Базы с TEST MIRROR
+    (реплика) на это время тоже смотрят в тестовую базу.
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    mirrors = {
+        alias: connections[alias].settings_dict.copy()
+        for alias in connections
+        if connections[alias].settings_dict.get(
+            'TEST', {}).get('MIRROR') == DEFAULT_DB_ALIAS
+    }
+    for alias in mirrors:
+        connections[alias].close()
+        connections[alias].creation.set_as_test_mirror(
+            connection.settings_dict)
+    try:
+        with tempfile.TemporaryDirectory() as media_root:
+            with override_settings(MEDIA_ROOT=media_root):
+                yield
+    finally:
+        for alias, settings_dict in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict = settings_dict
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed_dataset(recipes, seed=BENCHMARK_SEED):
+    """Заполняет базу синтетическими данными фиксированного размера."""
+    call_command('generate_dataset', recipes=recipes,
+                 users=max(recipes // 10, 10), seed=seed, stdout=StringIO())
+
+
+def consume(response):
+    if response.streaming:
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def measure(client, path, repeats, method='get', data=None, undo=None,
+            content_type=None):
+    """
+    Выполняет запрос: первый раз для прогрева, затем repeats раз для
+    замера времени и ещё раз под tracemalloc для пикового объёма памяти.
+    Если задана отмена undo - пара (метод, тело), перед каждым выполнением
+    действие предыдущего запроса отменяется этим запросом к тому же адресу
+    вне замера. Тело с content_type передаётся как есть, иначе - в JSON.
+    """
+    def send():
+        if method == 'get':
+            return client.get(path)
+        if content_type is not None:
+            return getattr(client, method)(
+                path, data, content_type=content_type)
+        return getattr(client, method)(path, data, format='json')
+
+    def reset():
+        if undo is not None:
+            undo_method, undo_data = undo
+            getattr(client, undo_method)(path, undo_data, format='json')
+
+    reset()
+    consume(send())
+    reset()
+    queries = QueryStats()
+    with connection.execute_wrapper(queries):
+        response = send()
+        consume(response)
+    timings = []
+    for _ in range(repeats):
+        reset()
+        started = time.perf_counter()
+        consume(send())
+        timings.append((time.perf_counter() - started) * 1000)
+    reset()
+    tracemalloc.start()
+    try:
+        consume(send())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'status': response.status_code,
+        'ms': round(statistics.median(timings), 2),
+        'queries': queries.count,
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def benchmark_user():
+    """Пользователь с самым длинным списком покупок."""
+    cart_owner = ShoppingCart.objects.values('user').annotate(
+        total=Count('id')).order_by('-total', 'user').first()
+    return User.objects.get(id=cart_owner['user'])
+
+
+def benchmark_clients():
+    """
+    Клиенты для режимов ROUTES: аноним, пользователь с самым длинным
+    списком покупок и администратор. Пользователю ставится в очередь
+    удаление одного рецепта, чтобы было что показать в его заданиях.
+    """
+    user = benchmark_user()
+    enqueue_recipe_deletion(
+        [Recipe.objects.order_by('id').values_list('id', flat=True)[0]],
+        user)
+    admin = User.objects.create(
+        username='benchmark_admin', email='benchmark_admin@example.com',
+        is_staff=True)
+    clients = {ANON: APIClient()}
+    for mode, account in ((USER, user), (ADMIN, admin)):
+        clients[mode] = APIClient()
+        clients[mode].credentials(HTTP_AUTHORIZATION='Token {0}'.format(
+            Token.objects.create(user=account).key))
+    return clients
+
+
+def route_placeholders():
+    recipe = Recipe.objects.order_by('id').first()
+    user = benchmark_user()
+    return {
+        'author': recipe.author_id,
+        'recipe': recipe.id,
+        'tag': Tag.objects.order_by('id').first().id,
+        'ingredient': Ingredient.objects.order_by('id').first().id,
+        'job': DeletionJob.objects.filter(
+            requested_by=user).order_by('id').first().id,
+        'followee': User.objects.exclude(id=user.id).filter(
+            recipes__isnull=False).order_by('id').first().id,
+    }
+
+
+def route_paths():
+    """Тройки (имя, режим, адрес) ROUTES с подставленными id."""
+    placeholders = route_placeholders()
+    for name, path, modes in ROUTES:
+        for mode in modes:
+            yield name, mode, path.format(**placeholders)
+
+
+def write_requests():
+    """
+    Кортежи (имя, режим, метод, адрес, тело, отмена, тип тела)
+    WRITE_ROUTES с подставленными id.
+    """
+    placeholders = route_placeholders()
+    recipe = {
+        'name': 'Рецепт для замера',
+        'text': 'Описание рецепта для замера.',
+        'cooking_time': 10,
+        'image': BENCHMARK_IMAGE,
+        'tags': [placeholders['tag']],
+        'ingredients': [{'id': placeholders['ingredient'], 'amount': 5}],
+    }
+    bodies = {
+        None: None,
+        'recipe': recipe,
+        'import': json.dumps(recipe, ensure_ascii=False) + '\n',
+        'deletion': {'ids': [placeholders['recipe']]},
+        'add_recipe': {'add': [placeholders['recipe']]},
+        'remove_recipe': {'remove': [placeholders['recipe']]},
+        'add_author': {'add': [placeholders['followee']]},
+        'remove_author': {'remove': [placeholders['followee']]},
+    }
+    content_types = {'import': NDJSONParser.media_type}
+    for name, method, path, body, undo, modes in WRITE_ROUTES:
+        if undo is not None:
+            undo = (undo[0], bodies[undo[1]])
+        for mode in modes:
+            yield (name, mode, method, path.format(**placeholders),
+                   bodies[body], undo, content_types.get(body))
+
+
+class QueryCollector:
+    """Обёртка execute_wrapper: запоминает выполненные SELECT-запросы."""
+
+    def __init__(self):
+        self.queries = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip()[:6].upper() == 'SELECT':
+            self.queries.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def sequential_scans(sql, params):
+    """
+    Таблицы, которые план запроса в Postgres читает последовательным
+    сканированием. План строится с enable_seqscan = off: Seq Scan
+    остаётся в плане, только если для запроса нет подходящего индекса,
+    поэтому результат не зависит от объёма данных.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return {node['Relation Name'] for node in plan_nodes(plan[0]['Plan'])
+            if node['Node Type'] == 'Seq Scan'}
+
+
+def route_queries(clients):
+    """
+    SELECT-запросы маршрутов ROUTES, кроме FULL_SCAN_ROUTES, в двух
+    режимах чтения рецептов: через RecipeReader и через RecipeSerializer.
+    Словарь {sql: (параметры, маршрут)}.
+    """
+    fast_read = RecipeViewSet.fast_read
+    queries = {}
+    try:
+        for fast in (True, False):
+            RecipeViewSet.fast_read = fast
+            for name, mode, path in route_paths():
+                if name in FULL_SCAN_ROUTES:
+                    continue
+                collector = QueryCollector()
+                with connection.execute_wrapper(collector):
+                    consume(clients[mode].get(path))
+                for sql, params in collector.queries.items():
+                    queries.setdefault(sql, (params, f'{name}|{mode}'))
+    finally:
+        RecipeViewSet.fast_read = fast_read
+    return queries
+
+
+def large_table_scans(queries):
+    """
+    Тройки (маршрут, таблицы, sql) для запросов из route_queries, которые
+    последовательно сканируют таблицы из LARGE_TABLES.
+    """
+    problems = []
+    for sql, (params, route) in queries.items():
+        tables = sequential_scans(sql, params) & LARGE_TABLES
+        if tables:
+            problems.append((route, sorted(tables), sql))
+    return problems
@@ -0,0 +1,17 @@
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def shared_cache(alias):
+    """
+    Кэш alias, если его видят все процессы (memcached, файловый кэш,
+    база данных), иначе None. Локальный кэш у каждого воркера gunicorn
+    свой: сброс в одном воркере не доходит до остальных.
+    """
+    cache = caches[alias]
+    if isinstance(cache, PROCESS_LOCAL_BACKENDS):
+        return None
+    return cache
@@ -0,0 +1,80 @@
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from api.compression import ENCODERS, choose_encoding
+from foodgram.settings import COMPRESSION_MIN_SIZE
+from recipes.models import CatalogRevision
+
+
+def catalog_version():
+    """
+    Версия справочников ингредиентов и тэгов. Хранится в базе и меняется
+    в транзакции изменения справочника, поэтому все процессы видят одну
+    и ту же версию, а снимки и ETag разных воркеров не расходятся.
+    """
+    return CatalogRevision.objects.current()
+
+
+def bump_catalog_version():
+    CatalogRevision.objects.bump()
+
+
+class CatalogSnapshot:
+    """
+    Готовое тело ответа со всем справочником: исходные байты и их
+    сжатые варианты для каждой доступной кодировки. Пересобирается
+    при смене версии справочников.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.state = (None, {})
+
+    def get(self, build):
+        version = catalog_version()
+        current_version, variants = self.state
+        if version != current_version:
+            content = build()
+            variants = {None: content}
+            if len(content) >= COMPRESSION_MIN_SIZE:
+                variants.update((encoding, encode(content))
+                                for encoding, encode in ENCODERS.items())
+            self.state = (version, variants)
+        return version, variants
+
+    def response(self, request, build):
+        """Ответ из снимка с учётом Accept-Encoding и If-None-Match."""
+        version, variants = self.get(build)
+        etag = f'W/"{self.name}-{version}"'
+        if etag in (tag.strip() for tag in request.META.get(
+                'HTTP_IF_NONE_MATCH', '').split(',')):
+            response = HttpResponseNotModified()
+        else:
+            encoding = choose_encoding(request)
+            if encoding not in variants:
+                encoding = None
+            response = HttpResponse(
+                variants[encoding], content_type='application/json')
+            if encoding is not None:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+
+snapshots = {}
+
+
+def snapshot(name):
+    if name not in snapshots:
+        snapshots[name] = CatalogSnapshot(name)
+    return snapshots[name]
+
+
+def catalog_response(request, name, build):
+    return snapshot(name).response(request, build)
+
+
+def preload_catalog(name, build):
+    """Собирает снимок заранее, до первого запроса к справочнику."""
+    snapshot(name).get(build)
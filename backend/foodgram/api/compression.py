@@ -0,0 +1,43 @@
+import gzip
+
+from foodgram.settings import BROTLI_QUALITY, GZIP_LEVEL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODERS = {'gzip': lambda content: gzip.compress(content, GZIP_LEVEL)}
+if brotli is not None:
+    ENCODERS['br'] = lambda content: brotli.compress(
+        content, quality=BROTLI_QUALITY)
+PREFERENCE = ('br', 'gzip')
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых через q=0."""
+    encodings = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name.strip().lower())
+    return encodings
+
+
+def choose_encoding(request):
+    """Лучшая доступная кодировка сжатия для запроса или None."""
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for name in PREFERENCE:
+        if name in ENCODERS and (name in accepted or '*' in accepted):
+            return name
+    return None
+
+
+def compress(content, encoding):
+    return ENCODERS[encoding](content)
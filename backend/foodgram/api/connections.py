@@ -0,0 +1,34 @@
+import time
+
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.dispatch import receiver
+
+from foodgram.settings import CONN_HEALTH_CHECK_INTERVAL
+
+
+@receiver(request_started)
+def check_idle_connections(**kwargs):
+    """
+    Проверка постоянных соединений перед запросом. Соединение, которое
+    простаивало дольше CONN_HEALTH_CHECK_INTERVAL секунд, проверяется
+    запросом SELECT 1 и закрывается, если сервер его уже разорвал:
+    следующий запрос к базе откроет новое. Активно используемые
+    соединения не проверяются.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        used_at = getattr(connection, 'used_at', now)
+        if now - used_at >= CONN_HEALTH_CHECK_INTERVAL and (
+                not connection.is_usable()):
+            connection.close()
+
+
+@receiver(request_finished)
+def mark_used_connections(**kwargs):
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.used_at = now
@@ -0,0 +1,195 @@
+import logging
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from foodgram.settings import DELETION_CHUNK_SIZE, DELETION_JOB_TIMEOUT
+from recipes.models import (ChangeLog, DeletionJob, Favorite, Recipe,
+                            RecipeDocument, RecipeIngredient, ShoppingCart)
+from users.models import AuthorRecommendation, Follow
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+RECIPE_DEPENDENTS = (Favorite, ShoppingCart, RecipeIngredient,
+                     Recipe.tags.through, RecipeDocument)
+
+
+class JobLostError(Exception):
+    """Задание признано брошенным и забрано другим обработчиком."""
+
+
+def raw_delete(queryset):
+    """DELETE одним запросом, без загрузки строк и сигналов."""
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_recipes(recipe_ids):
+    """
+    Удаляет рецепты и зависящие от них строки в одной транзакции.
+    Файлы изображений, на которые больше никто не ссылается, удаляются
+    после её фиксации.
+    """
+    with transaction.atomic():
+        images = list(Recipe.objects.filter(id__in=recipe_ids).exclude(
+            image='').values_list('image', flat=True))
+        for model in RECIPE_DEPENDENTS:
+            raw_delete(model.objects.filter(recipe_id__in=recipe_ids))
+        raw_delete(Recipe.objects.filter(id__in=recipe_ids))
+        ChangeLog.objects.record(
+            ChangeLog.RECIPE, ChangeLog.DELETED, recipe_ids)
+        transaction.on_commit(lambda: delete_orphaned_images(images))
+
+
+def delete_orphaned_images(names):
+    """Удаляет файлы, на которые больше не ссылается ни один рецепт."""
+    used = set(Recipe.objects.filter(image__in=names).values_list(
+        'image', flat=True))
+    for name in set(names) - used:
+        try:
+            default_storage.delete(name)
+        except OSError as error:
+            logger.warning('Не удалось удалить файл %s: %s', name, error)
+
+
+def chunks(queryset, chunk_size):
+    """Id строк queryset порциями; удалённые строки не возвращаются."""
+    while True:
+        ids = list(queryset.order_by('pk').values_list(
+            'pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+
+
+def delete_in_chunks(queryset, chunk_size):
+    for ids in chunks(queryset, chunk_size):
+        raw_delete(queryset.model.objects.filter(pk__in=ids))
+
+
+def delete_followers(author_id, chunk_size):
+    """Удаляет подписки на автора и сообщает о них подписчикам."""
+    followers = Follow.objects.filter(author_id=author_id)
+    for ids in chunks(followers, chunk_size):
+        with transaction.atomic():
+            rows = Follow.objects.filter(pk__in=ids)
+            ChangeLog.objects.bulk_create([
+                ChangeLog(kind=ChangeLog.FOLLOW, action=ChangeLog.REMOVED,
+                          object_id=author_id, user_id=user_id)
+                for user_id in rows.values_list('user_id', flat=True)
+            ])
+            raw_delete(rows)
+
+
+def heartbeat(job, *fields):
+    """
+    Сохраняет поля fields и отмечает, что задание выполняется. Если
+    задание тем временем забрал другой обработчик (сменилось
+    started_at), выполнение прерывается исключением JobLostError.
+    """
+    job.heartbeat_at = timezone.now()
+    updated = DeletionJob.objects.filter(
+        pk=job.pk, started_at=job.started_at).update(
+        heartbeat_at=job.heartbeat_at,
+        **{name: getattr(job, name) for name in fields})
+    if not updated:
+        raise JobLostError(job.pk)
+
+
+def run_job(job, chunk_size=DELETION_CHUNK_SIZE):
+    """
+    Выполняет задание: рецепты удаляются порциями, после каждой порции
+    сохраняется прогресс. Для пользователя затем удаляются его
+    избранное, список покупок, подписки и журнал, и только потом сама
+    запись пользователя - обычным delete(), которому остаются единицы
+    строк. Повторный запуск прерванного задания безопасен.
+    """
+    if job.kind == DeletionJob.USER:
+        recipes = Recipe.objects.filter(author_id__in=job.ids)
+    else:
+        recipes = Recipe.objects.filter(id__in=job.ids)
+    job.total = job.processed + recipes.count()
+    heartbeat(job, 'total')
+
+    for ids in chunks(recipes, chunk_size):
+        delete_recipes(ids)
+        job.processed += len(ids)
+        heartbeat(job, 'processed')
+
+    if job.kind == DeletionJob.USER:
+        for user_id in job.ids:
+            for model in (Favorite, ShoppingCart, ChangeLog,
+                          AuthorRecommendation):
+                delete_in_chunks(
+                    model.objects.filter(user_id=user_id), chunk_size)
+                heartbeat(job)
+            delete_in_chunks(AuthorRecommendation.objects.filter(
+                author_id=user_id), chunk_size)
+            delete_in_chunks(
+                Follow.objects.filter(user_id=user_id), chunk_size)
+            delete_followers(user_id, chunk_size)
+            heartbeat(job)
+            Token.objects.filter(user_id=user_id).delete()
+            User.objects.filter(id=user_id).delete()
+
+
+def claim_job():
+    """
+    Берёт следующее задание в работу. Выполняемое задание, которое не
+    отчитывалось (heartbeat) дольше DELETION_JOB_TIMEOUT, считается
+    брошенным и берётся заново; новое started_at отнимает его у
+    прежнего обработчика.
+    """
+    stale = timezone.now() - timedelta(seconds=DELETION_JOB_TIMEOUT)
+    with transaction.atomic():
+        job = DeletionJob.objects.select_for_update(skip_locked=True).filter(
+            Q(status=DeletionJob.PENDING)
+            | Q(status=DeletionJob.RUNNING, heartbeat_at__lt=stale)
+        ).order_by('id').first()
+        if job is None:
+            return None
+        job.status = DeletionJob.RUNNING
+        job.started_at = job.heartbeat_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at'])
+        return job
+
+
+def process_job(job, chunk_size=DELETION_CHUNK_SIZE):
+    try:
+        run_job(job, chunk_size)
+    except JobLostError:
+        logger.warning('Задание на удаление %s забрал другой обработчик',
+                       job.id)
+        return
+    except Exception as error:
+        logger.exception('Задание на удаление %s завершилось ошибкой', job.id)
+        job.status = DeletionJob.FAILED
+        job.error = str(error)
+    else:
+        job.status = DeletionJob.DONE
+    job.finished_at = timezone.now()
+    DeletionJob.objects.filter(pk=job.pk, started_at=job.started_at).update(
+        status=job.status, error=job.error, finished_at=job.finished_at)
+
+
+def enqueue_user_deletion(user, requested_by=None):
+    """
+    Ставит удаление пользователя в очередь. Пользователь сразу
+    деактивируется: сохранение сбрасывает кэш его токенов.
+    """
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        return DeletionJob.objects.enqueue(
+            DeletionJob.USER, [user.id], requested_by)
+
+
+def enqueue_recipe_deletion(recipe_ids, requested_by=None):
+    return DeletionJob.objects.enqueue(
+        DeletionJob.RECIPES, recipe_ids, requested_by)
@@ -0,0 +1,119 @@
+import json
+from collections import defaultdict
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from foodgram.settings import FAST_READ_SERIALIZERS
+from recipes.models import Recipe, RecipeDocument, RecipeIngredient
+
+User = get_user_model()
+
+RECIPE_COLUMNS = ('id', 'author_id', 'name', 'image', 'text', 'cooking_time')
+AUTHOR_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name')
+TAG_FIELDS = ('tag__id', 'tag__name', 'tag__color', 'tag__slug')
+INGREDIENT_FIELDS = ('ingredient__id', 'ingredient__name',
+                     'ingredient__measurement_unit', 'amount')
+REBUILD_CHUNK_SIZE = 500
+
+# Документы читает только RecipeReader, то есть только при включённом
+# FAST_READ_SERIALIZERS. Без него запись рецептов, авторов и
+# справочников не тратит время на пересборку документов; после
+# включения флага их нужно собрать командой rebuild_documents.
+maintained = FAST_READ_SERIALIZERS
+
+
+def accessor(fields, names):
+    """
+    Заранее собранная функция, превращающая строку values() в словарь
+    с ключами names в том же порядке, что и у сериализатора.
+    """
+    getter = itemgetter(*fields)
+    return lambda row: dict(zip(names, getter(row)))
+
+
+tag_row = accessor(TAG_FIELDS, ('id', 'name', 'color', 'slug'))
+ingredient_row = accessor(
+    INGREDIENT_FIELDS, ('id', 'name', 'measurement_unit', 'amount'))
+author_row = accessor(AUTHOR_FIELDS, AUTHOR_FIELDS)
+
+
+def recipe_tags(recipe_ids):
+    tags = defaultdict(list)
+    for row in Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids).order_by('tag__slug').values(
+            'recipe_id', *TAG_FIELDS):
+        tags[row['recipe_id']].append(tag_row(row))
+    return tags
+
+
+def recipe_ingredients(recipe_ids):
+    ingredients = defaultdict(list)
+    for row in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).order_by('id').values(
+            'recipe_id', *INGREDIENT_FIELDS):
+        ingredients[row['recipe_id']].append(ingredient_row(row))
+    return ingredients
+
+
+def authors(author_ids):
+    return {row['id']: author_row(row) for row in User.objects.filter(
+        id__in=author_ids).values(*AUTHOR_FIELDS)}
+
+
+def build_documents(recipe_ids):
+    """
+    Документы рецептов в формате RecipeSerializer без флагов текущего
+    пользователя. Вместо абсолютного адреса изображения хранится адрес
+    из хранилища: хост подставляется при чтении.
+    """
+    rows = list(Recipe.objects.filter(id__in=recipe_ids).values(
+        *RECIPE_COLUMNS))
+    ids = [row['id'] for row in rows]
+    tags = recipe_tags(ids)
+    ingredients = recipe_ingredients(ids)
+    recipe_authors = authors({row['author_id'] for row in rows})
+    return {row['id']: {
+        'id': row['id'],
+        'tags': tags[row['id']],
+        'author': recipe_authors[row['author_id']],
+        'ingredients': ingredients[row['id']],
+        'name': row['name'],
+        'image': default_storage.url(row['image']) if row['image'] else None,
+        'text': row['text'],
+        'cooking_time': row['cooking_time'],
+    } for row in rows}
+
+
+def dumps(document):
+    return json.dumps(document, ensure_ascii=False, separators=(',', ':'))
+
+
+def rebuild_documents(recipe_ids, chunk_size=REBUILD_CHUNK_SIZE,
+                      force=False):
+    """
+    Пересобирает документы рецептов в текущей транзакции. Если документы
+    не поддерживаются (maintained), ничего не делает без force.
+    """
+    if not (maintained or force):
+        return
+    recipe_ids = list(recipe_ids)
+    with transaction.atomic():
+        for offset in range(0, len(recipe_ids), chunk_size):
+            chunk = recipe_ids[offset:offset + chunk_size]
+            documents = build_documents(chunk)
+            RecipeDocument.objects.filter(recipe_id__in=chunk).delete()
+            RecipeDocument.objects.bulk_create([
+                RecipeDocument(recipe_id=pk, body=dumps(document))
+                for pk, document in documents.items()
+            ])
+
+
+def rebuild_documents_where(**lookups):
+    """Пересобирает документы рецептов, подходящих под фильтр."""
+    if not maintained:
+        return
+    recipes = Recipe.objects.filter(**lookups).order_by().distinct()
+    rebuild_documents(recipes.values_list('id', flat=True))
@@ -0,0 +1,118 @@
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from foodgram.settings import EXPORT_CHUNK_SIZE
+from recipes.models import ChangeLog, Recipe, RecipeIngredient
+
+
+def parse_since(value):
+    """
+    Разбирает параметр since: дату и время в ISO 8601 или unix-время.
+    Для некорректного значения выбрасывает ValueError.
+    """
+    try:
+        return timezone.datetime.fromtimestamp(float(value), timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    since = parse_datetime(value)
+    if since is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Некорректное значение since: "{value}".')
+        since = timezone.datetime.combine(day, timezone.datetime.min.time())
+    if timezone.is_naive(since):
+        return timezone.make_aware(since)
+    return since
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def export_recipes(since=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Генератор строк NDJSON со всеми рецептами каталога.
+
+    Рецепты читаются серверным курсором, а тэги и ингредиенты догружаются
+    отдельным запросом на каждую пачку, поэтому расход памяти не зависит
+    от размера каталога. С since выгружаются только рецепты, изменённые
+    позже указанного момента, а за ними - строки об удалённых рецептах
+    (см. export_tombstones).
+    """
+    recipes = Recipe.objects.order_by('id').values(
+        'id', 'name', 'text', 'cooking_time', 'image', 'pub_date',
+        'updated_at', 'author_id', 'author__email', 'author__username')
+    if since is not None:
+        recipes = recipes.filter(updated_at__gt=since)
+    for chunk in chunked(recipes.iterator(chunk_size=chunk_size),
+                         chunk_size):
+        ids = [recipe['id'] for recipe in chunk]
+        tags = defaultdict(list)
+        for row in Recipe.tags.through.objects.filter(
+                recipe_id__in=ids).order_by('tag__slug').values(
+                'recipe_id', 'tag_id', 'tag__name', 'tag__color',
+                'tag__slug'):
+            tags[row['recipe_id']].append({
+                'id': row['tag_id'], 'name': row['tag__name'],
+                'color': row['tag__color'], 'slug': row['tag__slug'],
+            })
+        ingredients = defaultdict(list)
+        for row in RecipeIngredient.objects.filter(
+                recipe_id__in=ids).order_by('id').values(
+                'recipe_id', 'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'):
+            ingredients[row['recipe_id']].append({
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            })
+        for recipe in chunk:
+            yield json.dumps({
+                'id': recipe['id'],
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'image': recipe['image'],
+                'pub_date': recipe['pub_date'],
+                'updated_at': recipe['updated_at'],
+                'author': {
+                    'id': recipe['author_id'],
+                    'email': recipe['author__email'],
+                    'username': recipe['author__username'],
+                },
+                'tags': tags[recipe['id']],
+                'ingredients': ingredients[recipe['id']],
+            }, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+    if since is not None:
+        yield from export_tombstones(since, chunk_size)
+
+
+def export_tombstones(since, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Строки NDJSON {"id", "deleted": true, "deleted_at"} о рецептах,
+    удалённых позже since, по записям журнала изменений. Сжатие журнала
+    с --days удаляет и эти записи: клиенту, чья последняя выгрузка
+    старше сжатия, нужна полная выгрузка.
+    """
+    deletions = ChangeLog.objects.filter(
+        kind=ChangeLog.RECIPE, action=ChangeLog.DELETED,
+        created_at__gt=since,
+    ).values('object_id').annotate(
+        deleted_at=Max('created_at')).order_by('object_id')
+    for row in deletions.iterator(chunk_size=chunk_size):
+        yield json.dumps({
+            'id': row['object_id'],
+            'deleted': True,
+            'deleted_at': row['deleted_at'],
+        }, cls=DjangoJSONEncoder) + '\n'
@@ -1,15 +1,66 @@
 import base64
+import uuid
+from io import BytesIO
 
 from django.core.files.base import ContentFile
+from PIL import Image
 from rest_framework import serializers
 
+IMAGE_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+
+
+def decode_image(data):
+    """
+    Файл из строки data:image/<тип>;base64,<данные>. Содержимое
+    проверяется Pillow, а расширение берётся из распознанного формата,
+    а не из заявленного клиентом типа; форматы вне IMAGE_EXTENSIONS
+    отклоняются.
+    """
+    _, separator, payload = data.partition(';base64,')
+    if not separator:
+        raise serializers.ValidationError(
+            'Изображение должно быть закодировано в base64.')
+    try:
+        content = base64.b64decode(payload, validate=True)
+        image = Image.open(BytesIO(content))
+        image.verify()
+    except Exception:
+        raise serializers.ValidationError(
+            'Загрузите корректное изображение.')
+    extension = IMAGE_EXTENSIONS.get(image.format)
+    if extension is None:
+        raise serializers.ValidationError(
+            'Допустимые форматы изображений: {0}.'.format(
+                ', '.join(IMAGE_EXTENSIONS.values())))
+    return ContentFile(content, name=f'{uuid.uuid4().hex[:12]}.{extension}')
+
 
 class Base64ImageField(serializers.ImageField):
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_image(data)
 
         return super().to_internal_value(data)
+
+
+class ReferenceField(serializers.Field):
+    """Ссылка на объект: значение ключа или словарь, содержащий ключ."""
+    default_error_messages = {
+        'invalid': 'Ожидается id, слаг или объект с одним из них.'
+    }
+
+    def __init__(self, keys=('id',), **kwargs):
+        self.keys = keys
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict):
+            data = next(
+                (data[key] for key in self.keys if key in data), None)
+        if isinstance(data, bool) or not isinstance(data, (int, str)):
+            self.fail('invalid')
+        return data
+
+    def to_representation(self, value):
+        return value
@@ -0,0 +1,175 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from api.documents import rebuild_documents
+from api.fields import decode_image
+from api.serializers import RecipeImportSerializer
+from foodgram.settings import IMPORT_BATCH_SIZE
+from recipes.models import (ChangeLog, Ingredient, Recipe, RecipeIngredient,
+                            Tag)
+
+User = get_user_model()
+
+
+def create_recipes(recipes):
+    """
+    Массово создаёт рецепты и возвращает их с заполненными id.
+    Бэкенды, которые не возвращают id из bulk_create (SQLite),
+    сохраняют рецепты по одному.
+    """
+    if connection.features.can_return_ids_from_bulk_insert:
+        return Recipe.objects.bulk_create(recipes)
+    for recipe in recipes:
+        recipe.save(force_insert=True)
+    return recipes
+
+
+class RecipeImporter:
+    """
+    Потоковый импорт рецептов из строк NDJSON.
+
+    Строки проверяются по мере чтения, а записываются пачками:
+    bulk_create рецептов, затем связей с тэгами и ингредиентами.
+    Картинки из base64 декодируются и проверяются перед записью пачки,
+    строки с некорректной картинкой пропускаются. Файлы сохраняются
+    после фиксации пачки, чтобы не удлинять транзакцию.
+    """
+
+    def __init__(self, author=None, batch_size=IMPORT_BATCH_SIZE):
+        self.author = author
+        self.batch_size = batch_size
+        tags = list(Tag.objects.values_list('id', 'slug'))
+        known_tags = {pk: pk for pk, _ in tags}
+        known_tags.update({slug: pk for pk, slug in tags})
+        self.context = {
+            'tags': known_tags,
+            'ingredients': set(
+                Ingredient.objects.values_list('id', flat=True)),
+        }
+        self.report = {'lines': 0, 'created': 0, 'errors': []}
+
+    def run(self, lines):
+        """Импортирует строки и возвращает отчёт о загрузке."""
+        started = time.monotonic()
+        batch = []
+        for number, line in enumerate(lines, start=1):
+            item = self.parse(number, line)
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        if batch:
+            self.flush(batch)
+        elapsed = time.monotonic() - started
+        self.report['seconds'] = round(elapsed, 3)
+        self.report['rate'] = (
+            round(self.report['created'] / elapsed, 1) if elapsed else 0)
+        return self.report
+
+    def error(self, number, errors):
+        self.report['errors'].append({'line': number, 'errors': errors})
+
+    def parse(self, number, line):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError as error:
+                self.error(number, str(error))
+                return None
+        if not line.strip():
+            return None
+        self.report['lines'] += 1
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            self.error(number, str(error))
+            return None
+        serializer = RecipeImportSerializer(data=data, context=self.context)
+        if not serializer.is_valid():
+            self.error(number, serializer.errors)
+            return None
+        return number, serializer.validated_data
+
+    def resolve_authors(self, batch):
+        """Отбрасывает строки с несуществующими авторами."""
+        authors = set(User.objects.filter(
+            id__in={data['author'] for _, data in batch if 'author' in data}
+        ).values_list('id', flat=True))
+        if self.author is not None:
+            authors.add(self.author.id)
+        default = self.author.id if self.author is not None else None
+        resolved = []
+        for number, data in batch:
+            author_id = data.get('author', default)
+            if author_id not in authors:
+                self.error(number, {'author': ['Автор не найден.']})
+                continue
+            resolved.append((number, author_id, data))
+        return resolved
+
+    def decode_images(self, resolved):
+        """
+        Декодирует картинки из base64 и отбрасывает строки, в которых
+        картинка некорректна. Возвращает строки вместе с файлами.
+        """
+        decoded = []
+        for number, author_id, data in resolved:
+            image = None
+            if data['image'].startswith('data:image'):
+                try:
+                    image = decode_image(data['image'])
+                except ValidationError as error:
+                    self.error(number, {'image': error.detail})
+                    continue
+            decoded.append((number, author_id, data, image))
+        return decoded
+
+    def flush(self, batch):
+        resolved = self.decode_images(self.resolve_authors(batch))
+        if not resolved:
+            return
+        recipes = [
+            Recipe(author_id=author_id, name=data['name'], text=data['text'],
+                   cooking_time=data['cooking_time'],
+                   image='' if image is not None else data['image'])
+            for _, author_id, data, image in resolved
+        ]
+        with transaction.atomic():
+            recipes = create_recipes(recipes)
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag)
+                for recipe, (_, _, data, _) in zip(recipes, resolved)
+                for tag in data['tags']
+            ])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(recipe_id=recipe.id,
+                                 ingredient_id=ingredient['id'],
+                                 amount=ingredient['amount'])
+                for recipe, (_, _, data, _) in zip(recipes, resolved)
+                for ingredient in data['ingredients']
+            ])
+            rebuild_documents([recipe.id for recipe in recipes])
+            ChangeLog.objects.record(
+                ChangeLog.RECIPE, ChangeLog.CREATED,
+                [recipe.id for recipe in recipes])
+        self.report['created'] += len(recipes)
+        self.save_images([
+            (recipe, image)
+            for recipe, (_, _, _, image) in zip(recipes, resolved)
+            if image is not None
+        ])
+
+    def save_images(self, pending):
+        """Сохраняет проверенные картинки, рецепты - одним запросом."""
+        saved = []
+        for recipe, image in pending:
+            recipe.image.save(image.name, image, save=False)
+            saved.append(recipe)
+        with transaction.atomic():
+            Recipe.objects.bulk_update(saved, ('image',))
+            rebuild_documents([recipe.id for recipe in saved])
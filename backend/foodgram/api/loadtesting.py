@@ -0,0 +1,214 @@
+import http.client
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import quote, urlsplit
+
+
+def percentile(values, fraction):
+    """Перцентиль по ближайшему рангу; fraction - доля от 0 до 1."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class HttpSession:
+    """Keep-alive соединение одного виртуального пользователя."""
+
+    def __init__(self, base_url, token=None, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.headers = {'Accept': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f'Token {token}'
+        self.connection = None
+
+    def request(self, method, path, body=None):
+        """Выполняет запрос и возвращает код ответа и тело."""
+        headers = dict(self.headers)
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body, headers)
+                response = self.connection.getresponse()
+                return response.status, response.read()
+            except (OSError, http.client.HTTPException):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        return None
+
+
+class LoadTest:
+    """
+    Генератор нагрузки на потоках: каждый виртуальный пользователь
+    выбирает сценарий по весам из конфигурации и выполняет его шаги.
+    Конкурентность наращивается ступенями, пока рост пропускной
+    способности не остановится или не вырастет доля ошибок.
+    """
+
+    def __init__(self, config, log=print):
+        self.config = config
+        self.base_url = config['base_url']
+        self.log = log
+        self.flows = config['flows']
+        self.weights = [flow['weight'] for flow in self.flows]
+
+    def prepare(self):
+        """Получает токены пользователей и выборки id для подстановок."""
+        users = self.config['users']
+        self.tokens = []
+        for number in range(users['count']):
+            status, body = HttpSession(self.base_url).request(
+                'POST', '/api/auth/token/login/', {
+                    'email': users['email_template'].format(n=number),
+                    'password': users['password'],
+                })
+            if status == 200:
+                token = json.loads(body)['auth_token']
+                _, body = HttpSession(self.base_url, token).request(
+                    'GET', '/api/users/me/')
+                self.tokens.append((token, json.loads(body)['id']))
+        if not self.tokens:
+            raise RuntimeError('Не удалось войти ни одним пользователем.')
+
+        session = HttpSession(self.base_url)
+        recipes = json.loads(session.request(
+            'GET', '/api/recipes/?limit=100')[1])['results']
+        self.recipes = [recipe['id'] for recipe in recipes]
+        self.authors = sorted({recipe['author']['id'] for recipe in recipes})
+        self.tags = [tag['slug'] for tag in json.loads(
+            session.request('GET', '/api/tags/')[1])]
+        self.words = self.config['search_words']
+        self.log(f'Пользователей: {len(self.tokens)}, '
+                 f'рецептов в выборке: {len(self.recipes)}.')
+
+    def placeholders(self, rng, user_id):
+        word = rng.choice(self.words)
+        values = {
+            'recipe': rng.choice(self.recipes),
+            'author': rng.choice(
+                [author for author in self.authors if author != user_id]),
+            'tag': rng.choice(self.tags),
+            'page': rng.randint(1, self.config.get('max_page', 10)),
+        }
+        for length in range(1, 4):
+            values[f'prefix{length}'] = quote(word[:length])
+        return values
+
+    def worker(self, number, deadline, stats, lock):
+        """
+        Цикл виртуального пользователя до deadline. Ошибкой считаются
+        обрывы соединения и ответы 5xx, в том числе 503 при сбросе
+        нагрузки; ответ 4xx (например, повторная подписка) только
+        прерывает текущий сценарий. Ответы 429 считаются отдельно:
+        они означают, что упёрлись в лимиты частоты, а не в сервер.
+        """
+        rng = random.Random(number)
+        token, user_id = self.tokens[number % len(self.tokens)]
+        sessions = {False: HttpSession(self.base_url),
+                    True: HttpSession(self.base_url, token)}
+        think_min, think_max = self.config.get('think_time', (0, 0))
+        while time.monotonic() < deadline:
+            flow = rng.choices(self.flows, weights=self.weights)[0]
+            values = self.placeholders(rng, user_id)
+            session = sessions[flow.get('auth', False)]
+            for step in flow['steps']:
+                started = time.perf_counter()
+                try:
+                    status, _ = session.request(
+                        step['method'], step['path'].format(**values),
+                        step.get('body'))
+                except (OSError, http.client.HTTPException):
+                    status = 0
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    stats[step['name']]['latencies'].append(elapsed)
+                    if status == 0 or status >= 500:
+                        stats[step['name']]['errors'] += 1
+                    elif status == 429:
+                        stats[step['name']]['throttled'] += 1
+                if not 200 <= status < 400:
+                    break
+            if think_max:
+                time.sleep(rng.uniform(think_min, think_max))
+
+    def run_step(self, concurrency, seconds):
+        stats = defaultdict(
+            lambda: {'latencies': [], 'errors': 0, 'throttled': 0})
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+        threads = [
+            threading.Thread(target=self.worker,
+                             args=(number, deadline, stats, lock))
+            for number in range(concurrency)
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        endpoints = {}
+        for name, values in sorted(stats.items()):
+            latencies = values['latencies']
+            endpoints[name] = {
+                'requests': len(latencies),
+                'errors': values['errors'],
+                'throttled': values['throttled'],
+                'rps': round(len(latencies) / elapsed, 1),
+                'p50': round(percentile(latencies, 0.50), 1),
+                'p95': round(percentile(latencies, 0.95), 1),
+                'p99': round(percentile(latencies, 0.99), 1),
+            }
+        latencies = [latency for values in stats.values()
+                     for latency in values['latencies']]
+        errors = sum(values['errors'] for values in stats.values())
+        throttled = sum(values['throttled'] for values in stats.values())
+        return {
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'rps': round(len(latencies) / elapsed, 1),
+            'error_rate': round(errors / len(latencies), 4)
+            if latencies else 0,
+            'throttled': throttled,
+            'p50': round(percentile(latencies, 0.50), 1),
+            'p95': round(percentile(latencies, 0.95), 1),
+            'p99': round(percentile(latencies, 0.99), 1),
+            'endpoints': endpoints,
+        }
+
+    def run(self):
+        """Прогоняет ступени нагрузки и возвращает отчёт с точкой насыщения."""
+        self.prepare()
+        ramp = self.config['ramp']
+        limits = self.config['saturation']
+        steps = []
+        saturation = None
+        for concurrency in ramp['concurrency']:
+            result = self.run_step(concurrency, ramp['step_seconds'])
+            steps.append(result)
+            self.log(
+                'Потоков: {concurrency:>4}  {rps:>8.1f} rps  p50 {p50:>7.1f} '
+                'мс  p95 {p95:>7.1f} мс  p99 {p99:>7.1f} мс  ошибок '
+                '{error_rate:.2%}  429: {throttled}'.format(**result))
+            previous = steps[-2] if len(steps) > 1 else None
+            if result['error_rate'] > limits['max_error_rate'] or (
+                    previous is not None
+                    and result['rps'] < previous['rps']
+                    * (1 + limits['min_gain'])):
+                saturation = previous or result
+                break
+        return {'steps': steps, 'saturation': saturation}
@@ -0,0 +1,211 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from foodgram.settings import METRICS_DIR, METRICS_FLUSH_INTERVAL
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+COUNTERS = ('requests', 'latency_sum', 'queries', 'sql_seconds',
+            'response_bytes', 'over_budget')
+
+
+ARCHIVE_NAME = 'metrics_archive.json'
+
+
+def bucket_index(buckets, value):
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+
+class QueryStats:
+    """Обёртка execute_wrapper: считает SQL-запросы и время их выполнения."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов текущего процесса.
+
+    Значения периодически сбрасываются в файл metrics_<pid>.json в общем
+    каталоге METRICS_DIR, откуда их собирает эндпоинт метрик: так
+    суммируются данные всех воркеров gunicorn. Файлы завершившихся
+    воркеров переносятся в metrics_archive.json (см. retire).
+    """
+
+    def __init__(self, directory, flush_interval):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.series = {}
+        self.flushed_at = time.monotonic()
+
+    def empty_series(self):
+        series = dict.fromkeys(COUNTERS, 0)
+        series['latency_buckets'] = [0] * (len(LATENCY_BUCKETS) + 1)
+        series['query_buckets'] = [0] * (len(QUERY_BUCKETS) + 1)
+        return series
+
+    def observe(self, route, method, status, seconds, queries, sql_seconds,
+                size, over_budget):
+        key = f'{route}|{method}|{status}'
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = self.empty_series()
+            series['requests'] += 1
+            series['latency_sum'] += seconds
+            series['queries'] += queries
+            series['sql_seconds'] += sql_seconds
+            series['response_bytes'] += size
+            series['over_budget'] += int(over_budget)
+            series['latency_buckets'][
+                bucket_index(LATENCY_BUCKETS, seconds)] += 1
+            series['query_buckets'][
+                bucket_index(QUERY_BUCKETS, queries)] += 1
+        if time.monotonic() - self.flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if not self.series:
+                return
+            data = json.dumps(self.series)
+            self.flushed_at = time.monotonic()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def merge(self, merged, series):
+        for key, values in series.items():
+            total = merged.setdefault(key, self.empty_series())
+            for name in COUNTERS:
+                total[name] += values[name]
+            for name in ('latency_buckets', 'query_buckets'):
+                total[name] = [
+                    left + right
+                    for left, right in zip(total[name], values[name])]
+
+    def collect(self):
+        """Суммирует метрики всех процессов из общего каталога."""
+        self.flush()
+        merged = {}
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+            series = read_series(path)
+            if series is not None:
+                self.merge(merged, series)
+        return merged
+
+    def retire(self, pid):
+        """
+        Переносит метрики завершившегося процесса pid в архив и удаляет
+        его файл. Счётчики не уменьшаются, а файлы воркеров, которых
+        gunicorn перезапускает по max_requests, не копятся. Вызывается
+        из мастера gunicorn (хук child_exit) для воркеров и при выходе
+        для остальных процессов, например команд manage.py.
+        """
+        path = os.path.join(self.directory, f'metrics_{pid}.json')
+        archive_path = os.path.join(self.directory, ARCHIVE_NAME)
+        with archive_lock(self.directory):
+            series = read_series(path)
+            if series is None:
+                return
+            archive = read_series(archive_path) or {}
+            self.merge(archive, series)
+            temp_path = f'{archive_path}.{pid}.tmp'
+            with open(temp_path, 'w') as file:
+                json.dump(archive, file)
+            os.replace(temp_path, archive_path)
+            os.remove(path)
+
+    def close(self):
+        self.flush()
+        self.retire(os.getpid())
+
+
+@contextmanager
+def archive_lock(directory):
+    """Межпроцессная блокировка архива на время его перезаписи."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'archive.lock'), 'w') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        yield
+
+
+def read_series(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def render_histogram(lines, name, labels, buckets, counts, total, count):
+    cumulative = 0
+    for bound, value in zip(buckets + ('+Inf',), counts):
+        cumulative += value
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+
+
+def render_prometheus(merged):
+    """Формирует текст метрик в формате Prometheus exposition 0.0.4."""
+    lines = [
+        '# TYPE foodgram_request_duration_seconds histogram',
+        '# TYPE foodgram_request_queries histogram',
+        '# TYPE foodgram_sql_seconds_total counter',
+        '# TYPE foodgram_response_bytes_total counter',
+        '# TYPE foodgram_query_budget_exceeded_total counter',
+    ]
+    for key in sorted(merged):
+        series = merged[key]
+        route, method, status = key.split('|')
+        labels = f'route="{route}",method="{method}",status="{status}"'
+        render_histogram(
+            lines, 'foodgram_request_duration_seconds', labels,
+            LATENCY_BUCKETS, series['latency_buckets'],
+            series['latency_sum'], series['requests'])
+        render_histogram(
+            lines, 'foodgram_request_queries', labels, QUERY_BUCKETS,
+            series['query_buckets'], series['queries'], series['requests'])
+        lines.append(
+            f'foodgram_sql_seconds_total{{{labels}}} {series["sql_seconds"]}')
+        lines.append(f'foodgram_response_bytes_total{{{labels}}} '
+                     f'{series["response_bytes"]}')
+        lines.append(f'foodgram_query_budget_exceeded_total{{{labels}}} '
+                     f'{series["over_budget"]}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(METRICS_DIR, METRICS_FLUSH_INTERVAL)
+atexit.register(registry.close)
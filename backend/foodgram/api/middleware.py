@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+
+from api.admission import SlotLimiter, SlotRelease, fcntl, queue_time
+from api.authentication import CachedTokenAuthentication
+from api.caching import shared_cache
+from api.compression import choose_encoding, compress
+from api.metrics import QueryStats, registry
+from api.profiling import PROFILERS, SlowQueryExplainer, store
+from api.routers import use_replica
+from foodgram.settings import (ADMISSION_DIR, ADMISSION_EXEMPT_PATHS,
+                               ADMISSION_MAX_IN_FLIGHT,
+                               ADMISSION_MAX_QUEUE_TIME,
+                               ADMISSION_RETRY_AFTER, COMPRESSIBLE_TYPES,
+                               COMPRESSION_MIN_SIZE, PROFILE_HEADER,
+                               PROFILE_PARAM, QUERY_BUDGET,
+                               REPLICA_CACHE_ALIAS, REPLICA_DATABASE_ALIAS,
+                               REPLICA_PIN_COOKIE, REPLICA_STICKY_SECONDS,
+                               REQUEST_START_HEADER)
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Собирает по каждому маршруту длительность запроса, число и время
+    SQL-запросов и размер ответа. Запросы, превысившие QUERY_BUDGET
+    SQL-запросов, записываются в лог.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else 'unresolved'
+        over_budget = stats.count > QUERY_BUDGET
+        if over_budget:
+            logger.warning(
+                'Превышен бюджет SQL-запросов: %s %s (%s) - %d запросов '
+                'при бюджете %d.', request.method, request.path, route,
+                stats.count, QUERY_BUDGET)
+        registry.observe(
+            route, request.method, response.status_code, elapsed,
+            stats.count, stats.seconds,
+            0 if response.streaming else len(response.content),
+            over_budget)
+        return response
+
+
+def is_staff_request(request):
+    """Проверяет, что запрос сделан сотрудником (по сессии или токену)."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = (CachedTokenAuthentication().authenticate(request)
+                       or (None, None))
+        except AuthenticationFailed:
+            return False
+    return user is not None and user.is_staff
+
+
+class AdmissionControlMiddleware:
+    """
+    Сбрасывает нагрузку, чтобы задержки оставались ограниченными при
+    всплесках: запрос сразу получает 503 с Retry-After, если он
+    прождал в очереди перед воркером дольше ADMISSION_MAX_QUEUE_TIME
+    секунд (ответ ему уже никому не нужен) или если на машине
+    уже выполняется ADMISSION_MAX_IN_FLIGHT запросов, идущих в базу.
+    Слот потокового ответа (выгрузка, NDJSON) занят, пока сервер не
+    дочитает и не закроет тело. Проверки готовности и метрики не
+    ограничиваются.
+    """
+
+    def __init__(self, get_response):
+        if fcntl is None or not (
+                ADMISSION_MAX_IN_FLIGHT or ADMISSION_MAX_QUEUE_TIME):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.limiter = (SlotLimiter(ADMISSION_DIR, ADMISSION_MAX_IN_FLIGHT)
+                        if ADMISSION_MAX_IN_FLIGHT else None)
+
+    def reject(self, reason):
+        logger.warning('Запрос отклонён: %s.', reason)
+        response = JsonResponse(
+            {'detail': 'Сервер перегружен, повторите запрос позже.'},
+            status=503, json_dumps_params={'ensure_ascii': False})
+        response['Retry-After'] = str(ADMISSION_RETRY_AFTER)
+        return response
+
+    def __call__(self, request):
+        if request.path.startswith(ADMISSION_EXEMPT_PATHS):
+            return self.get_response(request)
+        if ADMISSION_MAX_QUEUE_TIME and queue_time(request.META.get(
+                REQUEST_START_HEADER)) > ADMISSION_MAX_QUEUE_TIME:
+            return self.reject('превышено время ожидания в очереди')
+        if self.limiter is None:
+            return self.get_response(request)
+        slot = self.limiter.acquire()
+        if slot is None:
+            return self.reject('нет свободных слотов')
+        release = SlotRelease(self.limiter, slot)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            release.close()
+            raise
+        if response.streaming:
+            response._closable_objects.append(release)
+        else:
+            release.close()
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запрос по требованию сотрудника: заголовок X-Profile или
+    параметр ?profile= со значением sample (по умолчанию) или cprofile.
+    Результат сохраняется в кольцевой буфер PROFILE_DIR, имя файла
+    возвращается в заголовке X-Profile-Id.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = (request.META.get(PROFILE_HEADER)
+                or request.GET.get(PROFILE_PARAM))
+        if not mode or not is_staff_request(request):
+            return self.get_response(request)
+        profiler_class = PROFILERS.get(mode, PROFILERS['sample'])
+        profiler = profiler_class()
+        profiler.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.stop()
+        response['X-Profile-Id'] = store.save(
+            'profile', profiler.output(),
+            getattr(profiler, 'extension', 'txt'))
+        return response
+
+
+class SlowQueryMiddleware:
+    """Сохраняет планы медленных SQL-запросов из вьюсетов и сериализаторов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        explainer = SlowQueryExplainer(store)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(explainer))
+            return self.get_response(request)
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы (brotli, если он установлен, иначе gzip) размером от
+    COMPRESSION_MIN_SIZE байт с типом из COMPRESSIBLE_TYPES. Потоковые
+    и уже сжатые ответы не трогает. Ответы на небезопасные методы не
+    сжимаются: в них бывают токены, а сжатие открывает атаку BREACH.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';')[0]
+        if (request.method not in SAFE_METHODS or response.streaming
+                or response.has_header('Content-Encoding')
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or len(response.content) < COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request)
+        if encoding is None:
+            return response
+        content = compress(response.content, encoding)
+        if len(content) >= len(response.content):
+            return response
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+
+def client_key(request):
+    """Ключ клиента по заголовку Authorization или сессионной cookie."""
+    credentials = (request.META.get('HTTP_AUTHORIZATION')
+                   or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    return 'replica:pin:' + hashlib.sha256(
+        credentials.encode()).hexdigest()[:32]
+
+
+class ReplicaMiddleware:
+    """
+    Отправляет чтение безопасных запросов на реплику. После записи
+    клиент на REPLICA_STICKY_SECONDS секунд закрепляется за основной
+    базой, чтобы видеть свои изменения, пока реплика догоняет.
+    Закрепление хранится в подписанной cookie ответа на запись, которую
+    проверяет любой воркер, а для клиентов без cookie - в общем кэше,
+    если он настроен: локальный кэш воркера другим воркерам не виден.
+    Без настроенной реплики middleware отключается.
+    """
+
+    def __init__(self, get_response):
+        if REPLICA_DATABASE_ALIAS not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cache = shared_cache(REPLICA_CACHE_ALIAS)
+
+    def pinned(self, request):
+        if request.get_signed_cookie(
+                REPLICA_PIN_COOKIE, default=None, salt=REPLICA_PIN_COOKIE,
+                max_age=REPLICA_STICKY_SECONDS):
+            return True
+        key = client_key(request)
+        return (self.cache is not None and key is not None
+                and bool(self.cache.get(key)))
+
+    def pin(self, request, response):
+        response.set_signed_cookie(
+            REPLICA_PIN_COOKIE, '1', salt=REPLICA_PIN_COOKIE,
+            max_age=REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        key = client_key(request)
+        if self.cache is not None and key is not None:
+            self.cache.set(key, True, REPLICA_STICKY_SECONDS)
+
+    def __call__(self, request):
+        safe = request.method in SAFE_METHODS
+        token = use_replica.set(safe and not self.pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        if not safe:
+            self.pin(request, response)
+        return response
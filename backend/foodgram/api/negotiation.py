@@ -0,0 +1,19 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+def available(classes):
+    return [item for item in classes if getattr(item, 'available', True)]
+
+
+class OptionalFormatNegotiation(DefaultContentNegotiation):
+    """
+    Не предлагает рендереры и парсеры, чьи необязательные зависимости
+    (например, msgpack) не установлены.
+    """
+
+    def select_parser(self, request, parsers):
+        return super().select_parser(request, available(parsers))
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return super().select_renderer(
+            request, available(renderers), format_suffix)
@@ -1,6 +1,80 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import (CursorPagination, LimitOffsetPagination,
+                                       PageNumberPagination)
+
+from foodgram.settings import ADMIN_EXACT_COUNT_LIMIT
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = 'limit'
+
+
+class ModelOrderingCursorPagination(CursorPagination):
+    """Курсор по порядку сортировки модели (Meta.ordering)."""
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return queryset.model._meta.ordering
+
+
+class KeysetOptionalPagination(LimitOffsetPagination):
+    """
+    limit/offset по умолчанию; с параметром cursor (в том числе пустым
+    для первой страницы) - постраничный обход по ключу без COUNT(*)
+    и OFFSET, стоимость страницы не зависит от глубины.
+    """
+    cursor_query_param = 'cursor'
+
+    def get_count(self, queryset):
+        """
+        Подсчёт без аннотаций: с ними Django 2.2 оборачивает COUNT(*)
+        в подзапрос с GROUP BY и вычисляет аннотации для каждой строки.
+        """
+        return queryset.order_by().values('pk').count()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params:
+            self.keyset = ModelOrderingCursorPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор админки для больших таблиц. Для списка без фильтров
+    в Postgres число строк берётся из статистики планировщика
+    (pg_class.reltuples) вместо COUNT(*) по всей таблице; точный
+    подсчёт выполняется, только если оценка меньше
+    ADMIN_EXACT_COUNT_LIMIT или список отфильтрован.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = self.estimate(queryset)
+            if estimate is not None and estimate >= ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row else None
@@ -0,0 +1,205 @@
+import cProfile
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+
+from django.db import DatabaseError
+
+from foodgram.settings import (PROFILE_DIR, PROFILE_MAX_FILES,
+                               PROFILE_SAMPLE_INTERVAL,
+                               SLOW_QUERY_EXPLAIN_INTERVAL, SLOW_QUERY_PATHS,
+                               SLOW_QUERY_THRESHOLD_MS)
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileStore:
+    """
+    Кольцевой буфер профилей на диске: хранит не больше max_files
+    последних файлов, самые старые удаляются при записи новых.
+    """
+
+    def __init__(self, directory, max_files):
+        self.directory = directory
+        self.max_files = max_files
+        self.lock = threading.Lock()
+
+    def save(self, kind, content, extension='txt'):
+        """Сохраняет профиль и возвращает имя его файла."""
+        name = '{0}_{1}_{2}.{3}'.format(
+            time.strftime('%Y%m%d%H%M%S'), kind, uuid.uuid4().hex[:8],
+            extension)
+        os.makedirs(self.directory, exist_ok=True)
+        mode = 'wb' if isinstance(content, bytes) else 'w'
+        with open(os.path.join(self.directory, name), mode) as file:
+            file.write(content)
+        with self.lock:
+            names = sorted(os.listdir(self.directory))
+            for stale in names[:max(len(names) - self.max_files, 0)]:
+                try:
+                    os.remove(os.path.join(self.directory, stale))
+                except OSError:
+                    pass
+        return name
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профайлер одного потока. Результат - свёрнутые стеки
+    в формате flamegraph.pl / speedscope: "frame;frame;frame count".
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.sampler = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.sampler.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.sampler.join()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{0} ({1}:{2})'.format(
+                    code.co_name, os.path.basename(code.co_filename),
+                    code.co_firstlineno))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def output(self):
+        return ''.join(f'{stack} {count}\n'
+                       for stack, count in self.stacks.most_common())
+
+
+class CProfileProfiler:
+    """Детерминированный профайлер; результат - файл pstats (.prof)."""
+    extension = 'prof'
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def output(self):
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+
+PROFILERS = {'sample': SamplingProfiler, 'cprofile': CProfileProfiler}
+
+
+class ExplainLimiter:
+    """
+    Общий для процесса лимит: план одного и того же запроса из одного
+    места кода снимается не чаще раза в interval секунд, и не больше
+    max_size разных планов за interval.
+    """
+    max_size = 1000
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.explained = {}
+
+    def allow(self, fingerprint):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.explained.get(fingerprint, -self.interval) < (
+                    self.interval):
+                return False
+            if len(self.explained) >= self.max_size:
+                self.explained = {
+                    key: moment for key, moment in self.explained.items()
+                    if now - moment < self.interval}
+                if len(self.explained) >= self.max_size:
+                    return False
+            self.explained[fingerprint] = now
+            return True
+
+
+explain_limiter = ExplainLimiter(SLOW_QUERY_EXPLAIN_INTERVAL)
+
+
+class SlowQueryExplainer:
+    """
+    Обёртка execute_wrapper: для SELECT-запросов дольше
+    SLOW_QUERY_THRESHOLD_MS, выполненных из SLOW_QUERY_PATHS, сохраняет
+    план EXPLAIN без ANALYZE: запрос не выполняется повторно, строится
+    только план. План одного запроса снимается не чаще раза в
+    SLOW_QUERY_EXPLAIN_INTERVAL секунд. Работает только с PostgreSQL.
+    """
+
+    def __init__(self, store, limiter=explain_limiter):
+        self.store = store
+        self.limiter = limiter
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.inspect(context['connection'], sql, params, many,
+                         (time.perf_counter() - started) * 1000)
+
+    def inspect(self, connection, sql, params, many, elapsed_ms):
+        """
+        Снимает план медленного запроса. Запрос, прерванный по
+        statement_timeout, тоже медленный: его план особенно полезен.
+        """
+        if (elapsed_ms >= SLOW_QUERY_THRESHOLD_MS and not many
+                and not self.explaining
+                and connection.vendor == 'postgresql'
+                and sql.lstrip()[:6].upper() == 'SELECT'):
+            origin = self.find_origin()
+            if origin is not None and self.limiter.allow((origin, sql)):
+                self.explain(connection, sql, params, elapsed_ms, origin)
+
+    def find_origin(self):
+        for frame in reversed(traceback.extract_stack()):
+            filename = frame.filename.replace(os.sep, '/')
+            if filename.endswith(SLOW_QUERY_PATHS):
+                return f'{filename}:{frame.lineno} {frame.name}'
+        return None
+
+    def plan(self, connection, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+            return '\n'.join(row[0] for row in cursor.fetchall())
+
+    def explain(self, connection, sql, params, elapsed_ms, origin):
+        self.explaining = True
+        try:
+            plan = self.plan(connection, sql, params)
+        except DatabaseError as error:
+            logger.warning('Не удалось получить план запроса: %s', error)
+            return
+        finally:
+            self.explaining = False
+        name = self.store.save('explain', (
+            f'-- {origin}\n-- {elapsed_ms:.1f} ms\n{sql}\n\n{plan}\n'))
+        logger.warning('Медленный запрос (%.1f мс) из %s, план: %s',
+                       elapsed_ms, origin, name)
+
+
+store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
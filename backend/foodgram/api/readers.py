@@ -0,0 +1,96 @@
+import json
+
+from django.contrib.auth import get_user_model
+
+from api.documents import build_documents
+from api.serializers import (PERSONAL_FIELDS, RecipeSerializer,
+                             is_shared_request, selected_fields)
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+User = get_user_model()
+
+
+class RecipeReader:
+    """
+    Быстрое чтение рецептов в формате RecipeSerializer.
+
+    Каждый рецепт читается одной строкой с готовым документом
+    (RecipeDocument), к которому добавляются только флаги текущего
+    пользователя и абсолютный адрес изображения. Для рецептов без
+    документа он собирается на лету. Поля, не выбранные параметрами
+    fields, omit и view, в ответ не попадают. Результат совпадает с
+    RecipeSerializer байт в байт, что проверяют тесты
+    tests/test_readers.py. Включается FAST_READ_SERIALIZERS.
+    """
+    columns = ('id', 'author_id', 'document__body')
+
+    def __init__(self, request):
+        self.request = request
+        self.user = request.user
+        self.personal = not is_shared_request(request)
+        self.fields = selected_fields(
+            request, RecipeSerializer.Meta.fields,
+            RecipeSerializer.field_presets)
+        if not self.personal:
+            self.fields = [name for name in self.fields
+                           if name not in PERSONAL_FIELDS]
+        self.images = {}
+
+    def image_url(self, url):
+        if url is None:
+            return None
+        if url not in self.images:
+            self.images[url] = self.request.build_absolute_uri(url)
+        return self.images[url]
+
+    def user_ids(self, model, field, ids):
+        if not self.personal or self.user.is_anonymous:
+            return set()
+        return set(model.objects.filter(
+            user=self.user, **{f'{field}__in': ids}).values_list(
+            field, flat=True))
+
+    def documents(self, rows):
+        built = build_documents(
+            [row['id'] for row in rows if row['document__body'] is None])
+        return [json.loads(row['document__body'])
+                if row['document__body'] is not None else built[row['id']]
+                for row in rows]
+
+    def plan(self, rows):
+        """
+        Функции получения значения каждого выбранного поля из документа.
+        Флаги пользователя выбираются только для нужных полей.
+        """
+        recipe_ids = [row['id'] for row in rows]
+        getters = {name: lambda document, name=name: document[name]
+                   for name in ('id', 'tags', 'author', 'ingredients',
+                                'name', 'text', 'cooking_time')}
+        getters['image'] = lambda document: self.image_url(document['image'])
+        if 'author' in self.fields and self.personal:
+            subscribed = self.user_ids(
+                Follow, 'author', {row['author_id'] for row in rows})
+
+            def author(document):
+                author = dict(document['author'])
+                author['is_subscribed'] = author['id'] in subscribed
+                return author
+
+            getters['author'] = author
+        if 'is_favorited' in self.fields:
+            favorited = self.user_ids(Favorite, 'recipe', recipe_ids)
+            getters['is_favorited'] = (
+                lambda document: document['id'] in favorited)
+        if 'is_in_shopping_cart' in self.fields:
+            in_cart = self.user_ids(ShoppingCart, 'recipe', recipe_ids)
+            getters['is_in_shopping_cart'] = (
+                lambda document: document['id'] in in_cart)
+        return [(name, getters[name]) for name in self.fields]
+
+    def serialize(self, rows):
+        """Превращает строки values(*self.columns) в данные ответа."""
+        rows = list(rows)
+        plan = self.plan(rows)
+        return [{name: getter(document) for name, getter in plan}
+                for document in self.documents(rows)]
@@ -0,0 +1,190 @@
+from itertools import chain
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from foodgram.settings import (RECOMMENDATION_CHUNK_SIZE,
+                               RECOMMENDATION_FAVORITE_WEIGHT,
+                               RECOMMENDATION_FOLLOW_WEIGHT,
+                               RECOMMENDATION_TOP_K)
+from recipes.models import ChangeLog, Favorite, Recipe
+from users.models import AuthorRecommendation, Follow
+
+User = get_user_model()
+
+EMPTY = np.zeros(0, dtype=np.int64)
+
+
+def id_array(queryset):
+    return np.fromiter(queryset.order_by('id').values_list(
+        'id', flat=True).iterator(), dtype=np.int64)
+
+
+def pair_array(queryset, *fields):
+    """Пары значений полей как массив N x 2 без списка кортежей в памяти."""
+    return np.fromiter(chain.from_iterable(
+        queryset.order_by().values_list(*fields).iterator()),
+        dtype=np.int64).reshape(-1, 2)
+
+
+class CSRGraph:
+    """
+    Разреженная матрица смежности в формате CSR: соседи строки i -
+    indices[indptr[i]:indptr[i + 1]], отсортированные по возрастанию.
+    """
+
+    def __init__(self, rows, cols, size):
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order]
+        self.indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=size), out=self.indptr[1:])
+
+    def row(self, index):
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def gather(self, rows):
+        """Соседи всех строк rows одним массивом (с повторами)."""
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return EMPTY
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.indices[offsets + np.arange(total)]
+
+    def in_degrees(self, size):
+        return np.bincount(self.indices, minlength=size)
+
+
+class RecommendationGraph:
+    """
+    Граф подписок и избранного в индексах 0..n-1 по возрастанию id
+    пользователей. Оценка автора-кандидата для пользователя:
+    RECOMMENDATION_FOLLOW_WEIGHT за каждого автора из подписок, который
+    подписан на кандидата (друзья друзей), и
+    RECOMMENDATION_FAVORITE_WEIGHT за каждый рецепт кандидата
+    в избранном пользователя. Пользователю без сигналов достаются
+    самые популярные по числу подписчиков авторы.
+    """
+
+    def __init__(self):
+        self.user_ids = id_array(User.objects.all())
+        size = len(self.user_ids)
+        recipe_ids = id_array(Recipe.objects.all())
+
+        recipes = pair_array(Recipe.objects.all(), 'id', 'author_id')
+        recipes, found = self.positions(
+            (recipe_ids, self.user_ids), recipes)
+        recipe_authors = np.zeros(len(recipe_ids), dtype=np.int64)
+        recipe_authors[recipes[found, 0]] = recipes[found, 1]
+
+        follows, found = self.positions(
+            (self.user_ids, self.user_ids),
+            pair_array(Follow.objects.all(), 'user_id', 'author_id'))
+        self.follows = CSRGraph(follows[found, 0], follows[found, 1], size)
+
+        favorites, found = self.positions(
+            (self.user_ids, recipe_ids),
+            pair_array(Favorite.objects.all(), 'user_id', 'recipe_id'))
+        self.favorite_authors = CSRGraph(
+            favorites[found, 0], recipe_authors[favorites[found, 1]], size)
+
+        self.is_author = np.zeros(size, dtype=bool)
+        self.is_author[recipe_authors] = True
+        popularity = self.follows.in_degrees(size)
+        self.popular = np.argsort(-popularity, kind='stable')[
+            :RECOMMENDATION_TOP_K * 2]
+
+    @staticmethod
+    def positions(id_arrays, pairs):
+        """
+        Индексы значений пар в отсортированных массивах id и маска пар,
+        оба значения которых найдены: строки, добавленные или удалённые
+        во время загрузки графа, отбрасываются.
+        """
+        indexes = np.zeros(pairs.shape, dtype=np.int64)
+        found = np.ones(len(pairs), dtype=bool)
+        for column, ids in enumerate(id_arrays):
+            index = np.searchsorted(ids, pairs[:, column])
+            found &= index < len(ids)
+            found[found] = ids[index[found]] == pairs[found, column]
+            indexes[:, column] = index
+        return indexes, found
+
+    def allowed(self, candidates, user, followed):
+        """Маска кандидатов-авторов, кроме самого пользователя и подписок."""
+        return (self.is_author[candidates]
+                & (candidates != user)
+                & ~np.isin(candidates, followed, assume_unique=True))
+
+    def score(self, user, top_k=RECOMMENDATION_TOP_K):
+        """
+        Пары (индекс автора, оценка) для пользователя с индексом user.
+        Если сигналов нет или все кандидаты отсеяны (например, все уже
+        в подписках), предлагаются популярные авторы с нулевой оценкой.
+        """
+        followed = self.follows.row(user)
+        friends_of_friends = self.follows.gather(followed)
+        favorite_authors = self.favorite_authors.row(user)
+        candidates, inverse = np.unique(
+            np.concatenate([friends_of_friends, favorite_authors]),
+            return_inverse=True)
+        weights = np.concatenate([
+            np.full(len(friends_of_friends), RECOMMENDATION_FOLLOW_WEIGHT),
+            np.full(len(favorite_authors), RECOMMENDATION_FAVORITE_WEIGHT),
+        ])
+        scores = np.bincount(inverse.ravel(), weights=weights,
+                             minlength=len(candidates))
+        allowed = self.allowed(candidates, user, followed)
+        if not allowed.any():
+            candidates = self.popular
+            scores = np.zeros(len(candidates))
+            allowed = self.allowed(candidates, user, followed)
+        candidates, scores = candidates[allowed], scores[allowed]
+        best = np.argsort(-scores, kind='stable')[:top_k]
+        return candidates[best], scores[best]
+
+    def recommendations(self, user_ids, top_k=RECOMMENDATION_TOP_K):
+        users, found = self.positions(
+            (self.user_ids,), np.asarray(user_ids, dtype=np.int64)[:, None])
+        for user in users[found, 0]:
+            authors, scores = self.score(user, top_k)
+            for rank, (author, score) in enumerate(zip(authors, scores), 1):
+                yield AuthorRecommendation(
+                    user_id=int(self.user_ids[user]),
+                    author_id=int(self.user_ids[author]),
+                    score=float(score), rank=rank)
+
+
+def store_recommendations(graph, user_ids,
+                          chunk_size=RECOMMENDATION_CHUNK_SIZE,
+                          top_k=RECOMMENDATION_TOP_K):
+    """Заменяет рекомендации пользователей порциями по chunk_size."""
+    user_ids = list(user_ids)
+    for offset in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[offset:offset + chunk_size]
+        rows = list(graph.recommendations(chunk, top_k))
+        with transaction.atomic():
+            AuthorRecommendation.objects.filter(user_id__in=chunk).delete()
+            AuthorRecommendation.objects.bulk_create(rows)
+
+
+def changed_users(cursor, since):
+    """
+    Пользователи, чьи рекомендации устарели после записи журнала cursor:
+    изменившие подписки или избранное, подписчики изменивших подписки
+    и зарегистрированные после since (им достаются популярные авторы).
+    """
+    changes = ChangeLog.objects.filter(
+        id__gt=cursor, user__isnull=False,
+        kind__in=(ChangeLog.FOLLOW, ChangeLog.FAVORITE))
+    users = set(changes.order_by().values_list(
+        'user_id', flat=True).distinct())
+    followed_changes = changes.filter(kind=ChangeLog.FOLLOW).order_by(
+    ).values('user_id')
+    users.update(Follow.objects.filter(
+        author_id__in=followed_changes).values_list('user_id', flat=True))
+    users.update(User.objects.filter(date_joined__gte=since).values_list(
+        'id', flat=True))
+    return sorted(users)
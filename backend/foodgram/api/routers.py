@@ -0,0 +1,31 @@
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from foodgram.settings import REPLICA_DATABASE_ALIAS
+
+use_replica = ContextVar('use_replica', default=False)
+
+
+class ReplicaRouter:
+    """
+    Направляет чтение на реплику, если её включил ReplicaMiddleware для
+    текущего запроса. Запись, миграции и чтение внутри транзакции на
+    основной базе всегда идут в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (use_replica.get()
+                and REPLICA_DATABASE_ALIAS in connections.databases
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return REPLICA_DATABASE_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
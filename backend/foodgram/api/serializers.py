@@ -1,20 +1,103 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserSerializer as UserHandleSerializer
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework.validators import UniqueTogetherValidator
 
-from api.fields import Base64ImageField
-from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from api.documents import rebuild_documents
+from api.fields import Base64ImageField, ReferenceField
+from foodgram.settings import (BATCH_MAX_SIZE, DELETION_BATCH_MAX_SIZE,
+                               FIELDS_PARAM, MEDIA_URL, OMIT_PARAM,
+                               SHARED_MODE_PARAM, VIEW_PARAM)
+from recipes.models import (ChangeLog, DeletionJob, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
 from users.models import Follow
 
 
 User = get_user_model()
 
+PERSONAL_FIELDS = ('is_subscribed', 'is_favorited', 'is_in_shopping_cart')
 
-class UserSerializer(UserHandleSerializer):
+
+def is_shared_request(request):
+    """Запрошен ли общий режим ответа без полей, зависящих от пользователя."""
+    return (request is not None
+            and request.query_params.get(SHARED_MODE_PARAM) in ('1', 'true'))
+
+
+def selected_fields(request, names, presets):
+    """
+    Поля из names (с сохранением порядка), оставленные параметрами
+    запроса: view - имя набора полей из presets, fields - список
+    нужных полей через запятую, omit - список ненужных.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return list(names)
+    params = request.query_params
+    selected = list(names)
+    view = params.get(VIEW_PARAM)
+    if view:
+        if view not in presets:
+            raise serializers.ValidationError({
+                VIEW_PARAM: 'Неизвестное представление {0}, доступны: '
+                            '{1}.'.format(view, ', '.join(sorted(presets)))
+            })
+        selected = [name for name in selected if name in presets[view]]
+    if params.get(FIELDS_PARAM):
+        wanted = params[FIELDS_PARAM].split(',')
+        selected = [name for name in selected if name in wanted]
+    if params.get(OMIT_PARAM):
+        omitted = params[OMIT_PARAM].split(',')
+        return [name for name in selected if name not in omitted]
+    return selected
+
+
+class SparseFieldsMixin:
+    """
+    Оставляет в ответе только поля, выбранные параметрами fields, omit
+    и view. Применяется лишь к корневому сериализатору запроса, у
+    вложенных сериализаторов набор полей не меняется.
+    """
+    field_presets = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        if parent is None:
+            selected = selected_fields(
+                self.context.get('request'), fields, self.field_presets)
+            for name in list(fields):
+                if name not in selected:
+                    fields.pop(name)
+        return fields
+
+
+class SharedRepresentationMixin:
+    """
+    В общем режиме убирает из ответа флаги текущего пользователя,
+    чтобы ответ можно было кэшировать сразу для всех пользователей.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if is_shared_request(self.context.get('request')):
+            for name in PERSONAL_FIELDS:
+                fields.pop(name, None)
+        return fields
+
+
+class UserSerializer(SparseFieldsMixin, SharedRepresentationMixin,
+                     UserHandleSerializer):
     """Сериализатор для обработки данных о пользователях."""
     is_subscribed = serializers.SerializerMethodField()
+    field_presets = {
+        'card': ('id', 'username', 'first_name', 'last_name',
+                 'is_subscribed'),
+    }
 
     class Meta:
         model = User
@@ -22,8 +105,10 @@ class UserSerializer(UserHandleSerializer):
                   'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
-        if user.is_anonymous:
+        if user.is_anonymous or user.id == obj.id:
             return False
         return Follow.objects.filter(user=user, author=obj.id).exists()
 
@@ -57,7 +142,8 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         ]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, SharedRepresentationMixin,
+                       serializers.ModelSerializer):
     tags = TagSerializer(read_only=True, many=True)
     image = Base64ImageField()
     author = UserSerializer(read_only=True)
@@ -66,6 +152,10 @@ class RecipeSerializer(serializers.ModelSerializer):
                                              source='recipe_ingredients')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    field_presets = {
+        'card': ('id', 'tags', 'author', 'name', 'image', 'cooking_time',
+                 'is_favorited', 'is_in_shopping_cart'),
+    }
 
     class Meta:
         model = Recipe
@@ -134,6 +224,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         return Recipe.objects.filter(shopping_cart__user=user,
                                      id=obj.id).exists()
 
+    @transaction.atomic
     def create(self, validated_data):
         image = validated_data.pop('image')
         ingredients = validated_data.pop('ingredients')
@@ -141,17 +232,24 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(image=image, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        rebuild_documents([recipe.id])
+        ChangeLog.objects.record(
+            ChangeLog.RECIPE, ChangeLog.CREATED, [recipe.id])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
+        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients')
+        super().update(instance, validated_data)
         instance.tags.clear()
-        instance.tags.set(validated_data.pop('tags'))
+        instance.tags.set(tags)
         RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(
-            recipe=instance,
-            ingredients=validated_data.pop('ingredients')
-        )
-        super().update(instance, validated_data)
+        self.create_ingredients(recipe=instance, ingredients=ingredients)
+        Recipe.objects.touch([instance.id])
+        rebuild_documents([instance.id])
+        ChangeLog.objects.record(
+            ChangeLog.RECIPE, ChangeLog.UPDATED, [instance.id])
         return instance
 
 
@@ -208,3 +306,117 @@ class FollowSerializer(serializers.ModelSerializer):
 
     def get_recipes_count(self, obj):
         return Recipe.objects.filter(author=obj.author).count()
+
+
+class BatchSerializer(serializers.Serializer):
+    """Сериализатор пакетного изменения избранного, корзины и подписок."""
+    add = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False, default=list, max_length=BATCH_MAX_SIZE)
+    remove = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False, default=list, max_length=BATCH_MAX_SIZE)
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError({
+                'errors': 'Передайте хотя бы один id в add или remove.'
+            })
+        if set(data['add']) & set(data['remove']):
+            raise serializers.ValidationError({
+                'errors': 'Один и тот же id нельзя одновременно '
+                          'добавить и удалить.'
+            })
+        data['add'] = list(dict.fromkeys(data['add']))
+        data['remove'] = list(dict.fromkeys(data['remove']))
+        return data
+
+
+class RecipeDeletionSerializer(serializers.Serializer):
+    """Набор рецептов для фонового удаления."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=DELETION_BATCH_MAX_SIZE)
+
+    def validate_ids(self, value):
+        value = list(dict.fromkeys(value))
+        user = self.context['request'].user
+        recipes = Recipe.objects.filter(id__in=value)
+        if not user.is_admin:
+            recipes = recipes.filter(author=user)
+        unknown = set(value) - set(recipes.values_list('id', flat=True))
+        if unknown:
+            raise serializers.ValidationError(
+                'Рецепты не найдены или принадлежат другим авторам: '
+                '{0}.'.format(', '.join(map(str, sorted(unknown)))))
+        return value
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = DeletionJob
+        fields = ('id', 'kind', 'status', 'total', 'processed', 'error',
+                  'created_at', 'started_at', 'finished_at')
+
+
+class ImportIngredientSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    amount = serializers.IntegerField(min_value=1)
+
+
+class RecipeImportSerializer(serializers.Serializer):
+    """
+    Сериализатор строки NDJSON-импорта рецептов.
+
+    Справочники тэгов и ингредиентов передаются в контексте, чтобы
+    проверка строки не обращалась к базе данных.
+    """
+    name = serializers.CharField(max_length=100)
+    text = serializers.CharField()
+    cooking_time = serializers.IntegerField(min_value=1)
+    image = serializers.CharField()
+    author = ReferenceField(required=False)
+    tags = serializers.ListField(child=ReferenceField(keys=('id', 'slug')))
+    ingredients = serializers.ListField(child=ImportIngredientSerializer())
+
+    def validate_author(self, value):
+        if not isinstance(value, int):
+            raise serializers.ValidationError(
+                'Автор задаётся числовым id.')
+        return value
+
+    def validate_image(self, value):
+        if value.startswith('data:image'):
+            if ';base64,' not in value:
+                raise serializers.ValidationError(
+                    'Изображение должно быть закодировано в base64.')
+            return value
+        return value.split(MEDIA_URL, 1)[-1]
+
+    def validate_tags(self, value):
+        known_tags = self.context['tags']
+        unknown = [str(tag) for tag in value if tag not in known_tags]
+        if unknown:
+            raise serializers.ValidationError(
+                'Неизвестные тэги: {0}.'.format(', '.join(unknown)))
+        tags = [known_tags[tag] for tag in value]
+        if len(tags) > len(set(tags)):
+            raise serializers.ValidationError(
+                'Один и тот же тэг нельзя применять дважды.')
+        return tags
+
+    def validate_ingredients(self, value):
+        if not value:
+            raise serializers.ValidationError(
+                'Добавьте минимум один ингредиент для рецепта')
+        ids = [ingredient['id'] for ingredient in value]
+        unknown = set(ids) - self.context['ingredients']
+        if unknown:
+            raise serializers.ValidationError(
+                'Неизвестные ингредиенты: {0}.'.format(
+                    ', '.join(map(str, sorted(unknown)))))
+        if len(ids) > len(set(ids)):
+            raise serializers.ValidationError(
+                'Дважды один тот же ингредиент в рецепт положить нельзя.')
+        return value
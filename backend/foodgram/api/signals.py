@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import invalidate_tokens
+from api.catalog import bump_catalog_version
+from api import documents
+from api.documents import (AUTHOR_FIELDS, rebuild_documents,
+                           rebuild_documents_where)
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """
+    Выход пользователя (удаление токена) сбрасывает кэш аутентификации.
+    Сброс выполняется после фиксации: иначе параллельный запрос успел бы
+    снова закэшировать ещё не изменённую строку.
+    """
+    keys = [instance.key]
+    transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Смена пароля, роли или активности пользователя сбрасывает кэш."""
+    if not created:
+        keys = list(Token.objects.filter(
+            user_id=instance.pk).values_list('key', flat=True))
+        transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_catalog(sender, **kwargs):
+    """Изменение справочника делает его готовые снимки устаревшими."""
+    bump_catalog_version()
+
+
+@receiver(post_save, sender=User)
+def rebuild_author_documents(sender, instance, created, update_fields,
+                             **kwargs):
+    """Данные автора входят в документы его рецептов."""
+    if created or (update_fields is not None
+                   and not set(update_fields) & set(AUTHOR_FIELDS)):
+        return
+    rebuild_documents_where(author_id=instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def rebuild_ingredient_documents(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_documents_where(recipe_ingredients__ingredient=instance)
+
+
+@receiver(post_save, sender=Tag)
+def rebuild_tag_documents(sender, instance, created, **kwargs):
+    if not created:
+        rebuild_documents_where(tags=instance)
+
+
+@receiver(pre_delete, sender=Ingredient)
+@receiver(pre_delete, sender=Tag)
+def remember_catalog_recipes(sender, instance, **kwargs):
+    """
+    Запоминает рецепты с удаляемым тэгом или ингредиентом: после
+    удаления связей их уже не найти, а документы нужно пересобрать.
+    """
+    if not documents.maintained:
+        return
+    lookup = 'tags' if sender is Tag else 'recipe_ingredients__ingredient'
+    instance.affected_recipes = list(Recipe.objects.filter(
+        **{lookup: instance}).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+def rebuild_catalog_documents(sender, instance, **kwargs):
+    rebuild_documents(getattr(instance, 'affected_recipes', ()))
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from foodgram.settings import SYNC_COMMIT_LAG, SYNC_PAGE_SIZE
+from recipes.models import (ChangeLog, ChangeLogCompaction, Favorite,
+                            ShoppingCart)
+from users.models import Follow
+
+MEMBERSHIP_KEYS = {
+    ChangeLog.FAVORITE: 'favorites',
+    ChangeLog.SHOPPING_CART: 'shopping_cart',
+    ChangeLog.FOLLOW: 'subscriptions',
+}
+
+
+def empty_feed(cursor, reset=False):
+    feed = {
+        'cursor': cursor,
+        'reset': reset,
+        'has_more': False,
+        'recipes': {ChangeLog.CREATED: [], ChangeLog.UPDATED: [],
+                    ChangeLog.DELETED: []},
+    }
+    for key in MEMBERSHIP_KEYS.values():
+        feed[key] = {ChangeLog.ADDED: [], ChangeLog.REMOVED: []}
+    return feed
+
+
+def commit_horizon():
+    """
+    Записи журнала моложе SYNC_COMMIT_LAG секунд ещё не устоялись: id
+    выдаётся при вставке, а не при фиксации транзакции, и запись с
+    меньшим id может стать видимой позже записи с большим.
+    """
+    return timezone.now() - timedelta(seconds=SYNC_COMMIT_LAG)
+
+
+def stable_cursor():
+    """Курсор, до которого включительно журнал уже не пополнится."""
+    return ChangeLog.objects.filter(
+        created_at__lte=commit_horizon()).aggregate(
+        last=Max('id'))['last'] or 0
+
+
+def advance_cursor(feed, rows):
+    """
+    Сдвигает курсор ленты до первой неустоявшейся записи. На ней лента
+    заканчивается, даже если записей больше, чем помещается в страницу.
+    """
+    horizon = commit_horizon()
+    for row_id, *_, created_at in rows:
+        if created_at > horizon:
+            feed['has_more'] = False
+            return
+        feed['cursor'] = row_id
+
+
+def collect_changes(user, cursor=None, limit=SYNC_PAGE_SIZE):
+    """
+    Собирает изменения рецептов и списков пользователя после cursor.
+
+    Несколько записей об одном объекте сворачиваются в итоговое
+    состояние. Если cursor не передан или записи после него могли быть
+    удалены сжатием журнала (курсор ниже границы последнего сжатия),
+    возвращается reset=True: клиенту нужно один раз загрузить списки
+    целиком.
+
+    Неустоявшиеся записи (см. commit_horizon) отдаются, но курсор на
+    них не сдвигается: клиент получит их повторно вместе с записями,
+    зафиксированными позже, а итоговые состояния применяются повторно
+    без вреда.
+    """
+    watermark = ChangeLogCompaction.objects.aggregate(
+        watermark=Max('watermark'))['watermark'] or 0
+    if cursor is None or cursor < watermark:
+        return empty_feed(stable_cursor(), reset=True)
+
+    rows = list(ChangeLog.objects.filter(
+        Q(user__isnull=True, kind=ChangeLog.RECIPE) | Q(user=user),
+        id__gt=cursor,
+    ).order_by('id').values_list(
+        'id', 'kind', 'action', 'object_id', 'created_at')[:limit + 1])
+    feed = empty_feed(cursor)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        feed['has_more'] = True
+
+    advance_cursor(feed, rows)
+
+    recipes = {}
+    members = {kind: {} for kind in MEMBERSHIP_KEYS}
+    for _, kind, action, object_id, _ in rows:
+        if kind != ChangeLog.RECIPE:
+            members[kind][object_id] = action
+        elif not (action == ChangeLog.UPDATED
+                  and recipes.get(object_id) == ChangeLog.CREATED):
+            recipes[object_id] = action
+
+    for object_id, action in sorted(recipes.items()):
+        feed['recipes'][action].append(object_id)
+    for kind, states in members.items():
+        for object_id, action in sorted(states.items()):
+            feed[MEMBERSHIP_KEYS[kind]][action].append(object_id)
+    return feed
+
+
+def delta_encode(ids):
+    """Кодирует отсортированный список id разностями соседних значений."""
+    return [current - previous
+            for previous, current in zip([0] + ids, ids)]
+
+
+def user_state(user, delta=False):
+    """
+    Возвращает id рецептов в избранном и списке покупок и id авторов,
+    на которых подписан пользователь, отсортированными массивами.
+
+    Курсор журнала берётся до чтения списков и только по устоявшимся
+    записям: изменения, сделанные во время чтения или ещё не
+    зафиксированные, клиент получит повторно через ленту синхронизации.
+    """
+    cursor = stable_cursor()
+    state = {
+        'cursor': cursor,
+        'encoding': 'delta' if delta else 'plain',
+        'favorites': list(Favorite.objects.filter(user=user).order_by(
+            'recipe_id').values_list('recipe_id', flat=True)),
+        'shopping_cart': list(ShoppingCart.objects.filter(
+            user=user).order_by('recipe_id').values_list(
+            'recipe_id', flat=True)),
+        'subscriptions': list(Follow.objects.filter(user=user).order_by(
+            'author_id').values_list('author_id', flat=True)),
+    }
+    if delta:
+        for key in MEMBERSHIP_KEYS.values():
+            state[key] = delta_encode(state[key])
+    return state
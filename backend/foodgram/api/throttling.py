@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+from foodgram.settings import THROTTLE_CACHE_ALIAS, THROTTLE_ENABLED
+
+READ = 'read'
+SEARCH = 'search'
+AGGREGATE = 'aggregate'
+WRITE = 'write'
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты запросов по классам эндпоинтов: класс задаётся
+    атрибутом throttle_scope вьюсета или действия, по умолчанию - read
+    для безопасных методов и write для остальных. Лимиты берутся из
+    DEFAULT_THROTTLE_RATES.
+
+    Вместо списка времён всех запросов за период, как у
+    SimpleRateThrottle, в кэше хранятся счётчики запросов за текущее и
+    предыдущее окно длиной в период. Число запросов за последний период
+    оценивается как счётчик текущего окна плюс доля предыдущего, ещё не
+    вышедшая за период. Счётчик меняется атомарными add и incr, поэтому
+    одновременные запросы из разных воркеров не затирают друг друга.
+    Кэш THROTTLE_CACHE_ALIAS должен быть общим для всех воркеров
+    (memcached): с локальным кэшем каждый воркер пропускает полный лимит.
+    """
+    enabled = THROTTLE_ENABLED
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        self.cache = caches[THROTTLE_CACHE_ALIAS]
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is not None:
+            return scope
+        return READ if request.method in SAFE_METHODS else WRITE
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def increment(self, key):
+        """Атомарно увеличивает счётчик окна, создавая его при отсутствии."""
+        self.cache.add(key, 0, self.duration * 2)
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Счётчик вытеснен из кэша между add и incr.
+            self.cache.add(key, 1, self.duration * 2)
+            return 1
+
+    def allow_request(self, request, view):
+        if not self.enabled:
+            return True
+        self.scope = self.get_scope(request, view)
+        self.rate = self.get_rate()
+        if self.rate is None:
+            return True
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self.key = self.get_cache_key(request, view)
+
+        now = self.timer()
+        window = int(now // self.duration)
+        self.elapsed = now - window * self.duration
+        key = f'{self.key}:{window}'
+        self.current = self.increment(key)
+        self.previous = self.cache.get(f'{self.key}:{window - 1}', 0)
+        estimate = self.previous * (
+            1 - self.elapsed / self.duration) + self.current
+        if estimate <= self.num_requests:
+            return True
+        # Отклонённый запрос в лимит не засчитывается.
+        try:
+            self.current = self.cache.decr(key)
+        except ValueError:
+            self.current = 0
+        return False
+
+    def wait(self):
+        """Секунды до того, как оценка опустится ниже лимита."""
+        remaining = self.duration - self.elapsed
+        free = self.num_requests - self.current - 1
+        if not self.previous or free < 0:
+            return remaining
+        needed = self.duration * (1 - free / self.previous) - self.elapsed
+        return min(max(needed, 0), remaining)
+
+
+@contextmanager
+def throttling_disabled():
+    """
+    Отключает ограничения в текущем процессе, например на время замеров
+    производительности, где один клиент выполняет сотни запросов подряд.
+    """
+    enabled = SlidingWindowThrottle.enabled
+    SlidingWindowThrottle.enabled = False
+    try:
+        yield
+    finally:
+        SlidingWindowThrottle.enabled = enabled
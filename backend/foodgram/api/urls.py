@@ -1,16 +1,21 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from api.views import (IngredientsViewSet, RecipeViewSet,
-                       TagsViewSet, UserViewSet)
+from api.views import (DeletionJobViewSet, IngredientsViewSet, MetricsView,
+                       ReadinessView, RecipeViewSet, SyncView, TagsViewSet,
+                       UserViewSet)
 
 router_v1 = DefaultRouter()
 router_v1.register('users', UserViewSet, basename='users')
 router_v1.register('tags', TagsViewSet, basename='tags')
 router_v1.register('ingredients', IngredientsViewSet, basename='ingredients')
 router_v1.register('recipes', RecipeViewSet, basename='recipes')
+router_v1.register('deletions', DeletionJobViewSet, basename='deletions')
 
 urlpatterns = [
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
+    path('health/ready/', ReadinessView.as_view(), name='readiness'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken'), name='auth'),
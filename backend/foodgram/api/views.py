@@ -1,34 +1,161 @@
 from django.contrib.auth import get_user_model
-from django.db.models import F, Sum
+from django.core.cache import caches
+from django.db import (DatabaseError, IntegrityError, connections,
+                       transaction)
+from django.db.models import Exists, F, OuterRef, Sum
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
 from djoser.views import UserViewSet as UserHandleSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import SearchFilter
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from api.catalog import catalog_response
+from api.deletion import enqueue_recipe_deletion, enqueue_user_deletion
+from api.exporter import export_recipes, parse_since
 from api.filters import IngredientFilter, RecipeFilter
-from api.pagination import LimitPageNumberPagination
-from api.permissions import IsAdminOrReadOnly, IsOwnerOrReadOnly
+from api.importer import RecipeImporter
+from api.metrics import registry, render_prometheus
+from api.pagination import KeysetOptionalPagination, LimitPageNumberPagination
+from api.parsers import NDJSONParser
+from api.permissions import IsAdmin, IsAdminOrReadOnly, IsOwnerOrReadOnly
+from api.readers import RecipeReader
+from api.renderers import FastJSONRenderer, PlainTextRenderer
 from api.serializers import (
-    FavoriteOrFollowSerializer, FollowSerializer, IngredientSerializer,
-    RecipeSerializer, TagSerializer
+    BatchSerializer, DeletionJobSerializer, FavoriteOrFollowSerializer,
+    FollowSerializer, IngredientSerializer, RecipeDeletionSerializer,
+    RecipeSerializer, TagSerializer, is_shared_request, selected_fields
 )
-from foodgram.settings import SHOPPING_LIST_NAME, SHOPPING_LIST_STRING
-from recipes.models import (Ingredient, RecipeIngredient, Recipe, Tag,
-                            Favorite, ShoppingCart)
+from api.sync import collect_changes, user_state
+from api.throttling import AGGREGATE, READ, SEARCH
+from foodgram.settings import (FAST_READ_SERIALIZERS, READINESS_CACHE_ALIAS,
+                               SHARED_CACHE_MAX_AGE, SHOPPING_LIST_NAME,
+                               SHOPPING_LIST_STRING)
+from recipes.models import (ChangeLog, DeletionJob, Ingredient,
+                            RecipeIngredient, Recipe, Tag, Favorite,
+                            ShoppingCart)
 from users.models import Follow
 
 
 User = get_user_model()
 
+CHANGE_KINDS = {
+    Favorite: ChangeLog.FAVORITE,
+    ShoppingCart: ChangeLog.SHOPPING_CART,
+    Follow: ChangeLog.FOLLOW,
+}
+
+
+def create_links(model, field_id, user, ids):
+    """
+    Создаёт связи и возвращает id, для которых строка действительно
+    вставлена. Связь, созданная параллельным запросом между чтением и
+    вставкой, нарушает уникальность: тогда пакет повторяется поштучно,
+    каждая вставка в своей точке сохранения.
+    """
+    if not ids:
+        return []
+    try:
+        with transaction.atomic():
+            model.objects.bulk_create(
+                [model(user=user, **{field_id: pk}) for pk in ids])
+        return ids
+    except IntegrityError:
+        pass
+    created = []
+    for pk in ids:
+        try:
+            with transaction.atomic():
+                model.objects.create(user=user, **{field_id: pk})
+        except IntegrityError:
+            continue
+        created.append(pk)
+    return created
+
+
+def apply_batch(model, field, targets, user, add, remove):
+    """
+    Пакетно добавляет и удаляет связи пользователя в одной транзакции.
+
+    model - модель связи (Favorite, ShoppingCart, Follow), field - имя
+    внешнего ключа на объект связи, targets - queryset допустимых объектов.
+    Возвращает статус по каждому переданному id. Статусы и журнал
+    изменений отражают только строки, которые изменил этот запрос:
+    удаляемые связи блокируются до удаления, а созданные определяются
+    по результату вставки.
+    """
+    field_id = f'{field}_id'
+    with transaction.atomic():
+        available = set(targets.filter(id__in=add).values_list(
+            'id', flat=True))
+        present = set(model.objects.filter(
+            user=user, **{f'{field_id}__in': add}
+        ).values_list(field_id, flat=True))
+        created = create_links(
+            model, field_id, user,
+            [pk for pk in add if pk in available and pk not in present])
+        locked = dict(model.objects.select_for_update().filter(
+            user=user, **{f'{field_id}__in': remove}
+        ).values_list(field_id, 'id'))
+        deleted = [pk for pk in remove if pk in locked]
+        if deleted:
+            model.objects.filter(id__in=locked.values()).delete()
+        ChangeLog.objects.record(
+            CHANGE_KINDS[model], ChangeLog.ADDED, created, user)
+        ChangeLog.objects.record(
+            CHANGE_KINDS[model], ChangeLog.REMOVED, deleted, user)
+
+    created = set(created)
+
+    def add_status(pk):
+        if pk not in available:
+            return 'not_found'
+        return 'created' if pk in created else 'exists'
+
+    return {
+        'add': [{'id': pk, 'status': add_status(pk)} for pk in add],
+        'remove': [{'id': pk,
+                    'status': 'deleted' if pk in locked else 'not_found'}
+                   for pk in remove],
+    }
+
 
 class UserViewSet(UserHandleSet):
     """Вьюсет для управления пользователями и подписками."""
     lookup_url_kwarg = 'author_id'
+    pagination_class = KeysetOptionalPagination
+    filter_backends = (SearchFilter,)
+    search_fields = ('^username', '^first_name', '^last_name')
+
+    def get_queryset(self):
+        """
+        Подписка текущего пользователя на каждого автора вычисляется
+        одним подзапросом EXISTS, а не отдельным запросом на строку.
+        """
+        queryset = super().get_queryset()
+        user = self.request.user
+        if self.request.method not in SAFE_METHODS or user.is_anonymous:
+            return queryset
+        return queryset.annotate(is_subscribed=Exists(
+            Follow.objects.filter(user_id=user.id, author=OuterRef('pk'))))
+
+    def destroy(self, request, *args, **kwargs):
+        """Удаление пользователя выполняется в фоне, ответ - задание."""
+        super().destroy(request, *args, **kwargs)
+        return Response(DeletionJobSerializer(self.deletion_job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    def perform_destroy(self, instance):
+        self.deletion_job = enqueue_user_deletion(
+            instance, self.request.user)
 
     @action(methods=['POST', 'DELETE'], detail=True,)
     def subscribe(self, request, author_id):
@@ -37,19 +164,59 @@ class UserViewSet(UserHandleSet):
             if request.user.id == author.id:
                 raise ValueError('Нельзя подписаться на себя самого')
             else:
+                with transaction.atomic():
+                    follow = Follow.objects.create(user=request.user,
+                                                   author=author)
+                    ChangeLog.objects.record(
+                        ChangeLog.FOLLOW, ChangeLog.ADDED, [author.id],
+                        request.user)
                 serializer = FollowSerializer(
-                    Follow.objects.create(user=request.user, author=author),
-                    context={'request': request})
+                    follow, context={'request': request})
                 return Response(serializer.data,
                                 status=status.HTTP_201_CREATED)
 
         elif request.method == 'DELETE':
-            if Follow.objects.filter(user=request.user,
-                                     author=author).exists():
-                Follow.objects.filter(user=request.user,
-                                      author=author).delete()
+            with transaction.atomic():
+                if Follow.objects.filter(user=request.user,
+                                         author=author).delete()[0]:
+                    ChangeLog.objects.record(
+                        ChangeLog.FOLLOW, ChangeLog.REMOVED, [author.id],
+                        request.user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(methods=['POST'], detail=False, url_path='subscribe',
+            permission_classes=(IsAuthenticated,))
+    def subscribe_batch(self, request):
+        """Подписаться на авторов и отписаться от них одним запросом."""
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(apply_batch(
+            Follow, 'author', User.objects.exclude(id=request.user.id),
+            request.user, **serializer.validated_data))
+
+    @action(detail=False, url_path='me/state',
+            permission_classes=(IsAuthenticated,))
+    def state(self, request):
+        """Избранное, список покупок и подписки пользователя в виде id."""
+        delta = request.query_params.get('delta') in ('1', 'true')
+        return Response(user_state(request.user, delta))
+
+    @action(detail=False, permission_classes=(IsAuthenticated,),
+            pagination_class=LimitPageNumberPagination)
+    def recommendations(self, request):
+        """
+        Рекомендованные авторы из таблицы, которую заполняет команда
+        build_recommendations; авторы, на которых пользователь успел
+        подписаться, пропускаются. Список постраничный по номеру: курсор
+        пересортировал бы авторов и потерял порядок мест.
+        """
+        authors = self.get_queryset().filter(
+            recommended_to__user=request.user).exclude(
+            following__user=request.user).order_by('recommended_to__rank')
+        page = self.paginate_queryset(authors)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
         serializer = FollowSerializer(
@@ -58,20 +225,40 @@ class UserViewSet(UserHandleSet):
         return self.get_paginated_response(serializer.data)
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class CatalogViewSet(ReadOnlyModelViewSet):
+    """
+    Справочник. Полный список без параметров отдаётся из готового
+    снимка (см. api.catalog), без сериализации и сжатия на каждый запрос.
+    """
     permission_classes = (IsAdminOrReadOnly,)
+    pagination_class = None
+
+    @property
+    def throttle_scope(self):
+        """Поиск по справочнику дороже, чем выдача готового снимка."""
+        return SEARCH if self.request.query_params else READ
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return catalog_response(
+            request, self.queryset.model._meta.model_name, self.render_all)
+
+    def render_all(self):
+        serializer = self.get_serializer(self.get_queryset(), many=True)
+        return FastJSONRenderer().render(serializer.data)
+
+
+class TagsViewSet(CatalogViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    pagination_class = None
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
-    permission_classes = (IsAdminOrReadOnly,)
+class IngredientsViewSet(CatalogViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
-    pagination_class = None
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -81,22 +268,107 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
     permission_classes = (IsOwnerOrReadOnly,)
+    throttle_scope = None
+    fast_read = FAST_READ_SERIALIZERS
 
     def new_favorite_or_cart_object(self, model, user, pk):
         recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
+        with transaction.atomic():
+            model.objects.create(user=user, recipe=recipe)
+            ChangeLog.objects.record(
+                CHANGE_KINDS[model], ChangeLog.ADDED, [recipe.id], user)
         serializer = FavoriteOrFollowSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def remove_favorite_or_cart(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        with transaction.atomic():
+            if model.objects.filter(user=user, recipe__id=pk).delete()[0]:
+                ChangeLog.objects.record(
+                    CHANGE_KINDS[model], ChangeLog.REMOVED, [pk], user)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def batch_favorite_or_cart(self, model, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(apply_batch(
+            model, 'recipe', Recipe.objects.all(), request.user,
+            **serializer.validated_data))
+
+    def get_queryset(self):
+        """
+        Связанные объекты подгружаются заранее только для полей,
+        оставленных в ответе параметрами fields, omit и view.
+        """
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        fields = selected_fields(self.request, RecipeSerializer.Meta.fields,
+                                 RecipeSerializer.field_presets)
+        if 'author' in fields:
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(
+                'recipe_ingredients__ingredient')
+        if 'text' in fields:
+            return queryset
+        return queryset.defer('text')
+
+    def fast_list(self, request):
+        """Список рецептов через RecipeReader вместо RecipeSerializer."""
+        reader = RecipeReader(request)
+        queryset = self.filter_queryset(Recipe.objects.all()).values(
+            *reader.columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.serialize(page))
+        return Response(reader.serialize(queryset))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.fast_read:
+            return super().retrieve(request, *args, **kwargs)
+        reader = RecipeReader(request)
+        rows = self.filter_queryset(Recipe.objects.filter(
+            pk=kwargs[self.lookup_url_kwarg or self.lookup_field])).values(
+            *reader.columns)[:1]
+        if not rows:
+            raise Http404
+        return Response(reader.serialize(rows)[0])
+
+    def list(self, request, *args, **kwargs):
+        if self.fast_read:
+            response = self.fast_list(request)
+        else:
+            response = super().list(request, *args, **kwargs)
+        personal_filters = ('is_favorited', 'is_in_shopping_cart')
+        if is_shared_request(request) and not any(
+                request.query_params.get(name) for name in personal_filters):
+            patch_cache_control(response, public=True,
+                                max_age=SHARED_CACHE_MAX_AGE)
+        return response
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        ChangeLog.objects.record(
+            ChangeLog.RECIPE, ChangeLog.DELETED, [instance.id])
+        instance.delete()
+
+    @action(detail=False, methods=['POST'], url_path='delete',
+            permission_classes=(IsAuthenticated,))
+    def delete_batch(self, request):
+        """Фоновое удаление набора рецептов; ответ - задание."""
+        serializer = RecipeDeletionSerializer(
+            data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        job = enqueue_recipe_deletion(
+            serializer.validated_data['ids'], request.user)
+        return Response(DeletionJobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
     @action(detail=True, methods=['POST', 'DELETE'],
             permission_classes=[IsAuthenticated])
     def favorite(self, request, pk=None):
@@ -119,8 +391,43 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                                 request.user, pk)
         return None
 
+    @action(detail=False, methods=['POST'], url_path='favorite',
+            permission_classes=[IsAuthenticated])
+    def favorite_batch(self, request):
+        """Пакетно добавить рецепты в 'избранное' и удалить из него."""
+        return self.batch_favorite_or_cart(Favorite, request)
+
+    @action(detail=False, methods=['POST'], url_path='shopping_cart',
+            permission_classes=[IsAuthenticated])
+    def shopping_cart_batch(self, request):
+        """Пакетно добавить рецепты в список покупок и удалить из него."""
+        return self.batch_favorite_or_cart(ShoppingCart, request)
+
+    @action(detail=False, methods=['POST'], url_path='import',
+            permission_classes=(IsAdmin,), parser_classes=(NDJSONParser,))
+    def import_recipes(self, request):
+        """Массовый импорт рецептов из тела запроса в формате NDJSON."""
+        report = RecipeImporter(author=request.user).run(request.data)
+        return Response(report)
+
+    @action(detail=False, methods=['GET'], permission_classes=(IsAdmin,),
+            throttle_scope=AGGREGATE)
+    def export(self, request):
+        """Потоковая выгрузка всех рецептов в формате NDJSON."""
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_since(since)
+            except ValueError as error:
+                raise ValidationError({'since': str(error)})
+        response = StreamingHttpResponse(
+            export_recipes(since or None),
+            content_type='application/x-ndjson')
+        response['X-Export-Timestamp'] = timezone.now().isoformat()
+        return response
+
     @action(detail=False, methods=['GET'],
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,), throttle_scope=AGGREGATE)
     def download_shopping_cart(self, request):
         """Метод, реализующий скачивание списка покупок в виде файла."""
         shopping_list = RecipeIngredient.objects.filter(
@@ -137,3 +444,72 @@ class RecipeViewSet(viewsets.ModelViewSet):
         response['Content-Disposition'] = (
             f'attachment; 'f'filename={SHOPPING_LIST_NAME}')
         return response
+
+
+class DeletionJobViewSet(ReadOnlyModelViewSet):
+    """Ход фоновых удалений: свои задания, администратору - все."""
+    serializer_class = DeletionJobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        queryset = DeletionJob.objects.order_by('-id')
+        if self.request.user.is_admin:
+            return queryset
+        return queryset.filter(requested_by=self.request.user)
+
+
+class SyncView(APIView):
+    """Лента изменений для дельта-синхронизации клиентов."""
+    permission_classes = (IsAuthenticated,)
+    throttle_scope = AGGREGATE
+
+    def get(self, request):
+        cursor = request.query_params.get('cursor')
+        if cursor is not None:
+            try:
+                cursor = int(cursor)
+            except ValueError:
+                raise ValidationError({'cursor': 'Курсор должен быть числом.'})
+        return Response(collect_changes(request.user, cursor))
+
+
+class MetricsView(APIView):
+    """Метрики запросов всех воркеров в формате Prometheus."""
+    permission_classes = (IsAdmin,)
+    renderer_classes = (PlainTextRenderer,)
+
+    def get(self, request):
+        return Response(
+            render_prometheus(registry.collect()),
+            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class ReadinessView(APIView):
+    """
+    Готовность воркера принимать трафик: доступны все базы данных и
+    кэш. Без аутентификации, чтобы проверка не зависела от токенов.
+    """
+    authentication_classes = ()
+    permission_classes = ()
+    throttle_classes = ()
+
+    def get(self, request):
+        checks = {}
+        for alias in connections:
+            try:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                checks[alias] = True
+            except DatabaseError:
+                checks[alias] = False
+        cache = caches[READINESS_CACHE_ALIAS]
+        try:
+            cache.set('health:ready', True, 5)
+            checks['cache'] = cache.get('health:ready') is True
+        except Exception:
+            checks['cache'] = False
+        ready = all(checks.values())
+        return Response(
+            {'status': 'ok' if ready else 'unavailable', 'checks': checks},
+            status=(status.HTTP_200_OK if ready
+                    else status.HTTP_503_SERVICE_UNAVAILABLE))
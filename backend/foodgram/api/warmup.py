@@ -0,0 +1,73 @@
+import inspect
+import logging
+import time
+
+from django.apps import apps
+from django.db import DatabaseError, connections
+from django.urls import URLResolver, get_resolver
+from rest_framework import serializers as drf_serializers
+
+from api import serializers
+from api.catalog import preload_catalog
+
+logger = logging.getLogger(__name__)
+
+
+def compile_patterns(patterns):
+    for pattern in patterns:
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            compile_patterns(pattern.url_patterns)
+
+
+def warm_urls():
+    """Компилирует регулярные выражения всех маршрутов и индекс reverse."""
+    resolver = get_resolver()
+    compile_patterns(resolver.url_patterns)
+    resolver.reverse_dict
+
+
+def warm_models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def warm_serializers():
+    """Создаёт по экземпляру каждого сериализатора из api.serializers."""
+    for _, serializer_class in inspect.getmembers(
+            serializers, inspect.isclass):
+        if (issubclass(serializer_class, drf_serializers.BaseSerializer)
+                and serializer_class.__module__ == serializers.__name__):
+            serializer_class(context={'request': None}).fields
+
+
+def warm_catalogs():
+    from api.views import IngredientsViewSet, TagsViewSet
+
+    for viewset in (TagsViewSet, IngredientsViewSet):
+        view = viewset(request=None, format_kwarg=None)
+        preload_catalog(view.queryset.model._meta.model_name, view.render_all)
+
+
+STEPS = (warm_urls, warm_models, warm_serializers, warm_catalogs)
+
+
+def warmup():
+    """
+    Выполняет работу первого запроса заранее: маршруты, метаданные
+    моделей, поля сериализаторов и снимки справочников. Вызывается из
+    wsgi.py; с gunicorn --preload выполняется один раз в мастере, и
+    воркеры получают готовое состояние через copy-on-write. Соединения
+    с базой закрываются, чтобы не достаться воркерам после fork.
+    """
+    started = time.perf_counter()
+    try:
+        for step in STEPS:
+            try:
+                step()
+            except DatabaseError as error:
+                logger.warning('Прогрев %s пропущен: %s', step.__name__, error)
+    finally:
+        connections.close_all()
+    logger.info('Прогрев занял %.0f мс',
+                (time.perf_counter() - started) * 1000)
@@ -32,11 +32,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.AdmissionControlMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.SlowQueryMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -77,10 +83,54 @@ else:
             'USER': os.getenv('POSTGRES_USER', default='default'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='default'),
             'HOST': os.getenv('DB_HOST', default='db'),
-            'PORT': os.getenv('DB_PORT', default='5432')
+            'PORT': os.getenv('DB_PORT', default='5432'),
+            'OPTIONS': {
+                'connect_timeout': int(
+                    os.getenv('DB_CONNECT_TIMEOUT', default=5)),
+            },
         }
     }
 
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.getenv('DB_CONN_MAX_AGE', default=60))
+CONN_HEALTH_CHECK_INTERVAL = int(
+    os.getenv('DB_HEALTH_CHECK_INTERVAL', default=30))
+
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_STICKY_SECONDS = 5
+REPLICA_CACHE_ALIAS = 'default'
+REPLICA_PIN_COOKIE = 'replica_pin'
+if os.getenv('DB_REPLICA_HOST') or os.getenv('DB_REPLICA_NAME'):
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        **DATABASES['default'],
+        'NAME': os.getenv(
+            'DB_REPLICA_NAME', default=DATABASES['default']['NAME']),
+        'HOST': os.getenv(
+            'DB_REPLICA_HOST', default=DATABASES['default'].get('HOST', '')),
+        'PORT': os.getenv(
+            'DB_REPLICA_PORT', default=DATABASES['default'].get('PORT', '')),
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+AUTH_CACHE_ALIAS = 'default'
+AUTH_CACHE_TIMEOUT = 300
+# Кроме полей проверок прав - поля, которые выводят сериализаторы
+# пользователя (/api/users/me/, автор рецепта), чтобы они не догружались.
+AUTH_CACHE_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name',
+                     'role', 'is_active', 'is_staff', 'is_superuser')
+AUTH_LOCAL_CACHE_SIZE = 1024
+AUTH_LOCAL_CACHE_TTL = 5
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -99,14 +149,49 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.MessagePackRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'api.parsers.MessagePackParser',
+    ),
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS':
+        'api.negotiation.OptionalFormatNegotiation',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_THROTTLE_CLASSES': ('api.throttling.SlidingWindowThrottle',),
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.getenv('THROTTLE_READ_RATE', default='600/min'),
+        'search': os.getenv('THROTTLE_SEARCH_RATE', default='120/min'),
+        'aggregate': os.getenv('THROTTLE_AGGREGATE_RATE', default='20/min'),
+        'write': os.getenv('THROTTLE_WRITE_RATE', default='120/min'),
+    },
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', default=1)),
 }
+THROTTLE_ENABLED = os.getenv(
+    'THROTTLE_ENABLED', default='true').lower() in ('1', 'true')
+# Счётчики ограничения частоты должны быть общими для всех воркеров
+# (memcached в docker-compose). Локальный кэш по умолчанию годится только
+# для разработки: каждый воркер gunicorn считает запросы отдельно.
+THROTTLE_CACHE_ALIAS = 'default'
+
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', default=32))
+ADMISSION_MAX_QUEUE_TIME = float(
+    os.getenv('ADMISSION_MAX_QUEUE_TIME', default=2))
+ADMISSION_RETRY_AFTER = 1
+ADMISSION_DIR = os.getenv('ADMISSION_DIR', default='/tmp/foodgram_admission')
+ADMISSION_EXEMPT_PATHS = ('/api/health/', '/api/metrics/')
+REQUEST_START_HEADER = 'HTTP_X_REQUEST_START'
 
 
 INVALID_NAMES = [r'me$', r'.*[^\w.@+-_].*']
@@ -117,6 +202,60 @@ SHOPPING_LIST_STRING = '{0} ({1}) \u2014 {2}'
 
 SHOPPING_LIST_NAME = 'shopping_cart.txt'
 
+BATCH_MAX_SIZE = 100
+
+IMPORT_BATCH_SIZE = 500
+
+EXPORT_CHUNK_SIZE = 500
+
+SYNC_PAGE_SIZE = 1000
+SYNC_COMMIT_LAG = 60
+
+DELETION_CHUNK_SIZE = 1000
+DELETION_POLL_INTERVAL = 5
+DELETION_JOB_TIMEOUT = 3600
+DELETION_BATCH_MAX_SIZE = 1000
+
+RECOMMENDATION_TOP_K = 20
+RECOMMENDATION_CHUNK_SIZE = 500
+RECOMMENDATION_FOLLOW_WEIGHT = 1.0
+RECOMMENDATION_FAVORITE_WEIGHT = 0.5
+
+SHARED_MODE_PARAM = 'shared'
+SHARED_CACHE_MAX_AGE = 60
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+VIEW_PARAM = 'view'
+FAST_READ_SERIALIZERS = os.getenv(
+    'FAST_READ_SERIALIZERS', default='false').lower() in ('1', 'true')
+
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson',
+                      'application/msgpack', 'text/')
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+METRICS_DIR = os.getenv('METRICS_DIR', default='/tmp/foodgram_metrics')
+METRICS_FLUSH_INTERVAL = 5
+QUERY_BUDGET = int(os.getenv('QUERY_BUDGET', default=50))
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', default='/tmp/foodgram_profiles')
+PROFILE_MAX_FILES = 100
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+SLOW_QUERY_THRESHOLD_MS = int(
+    os.getenv('SLOW_QUERY_THRESHOLD_MS', default=500))
+SLOW_QUERY_PATHS = ('api/views.py', 'api/serializers.py')
+SLOW_QUERY_EXPLAIN_INTERVAL = 600
+
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+LOADTEST_CONFIG = os.path.join(BASE_DIR, 'benchmarks', 'loadtest.json')
+ADMIN_EXACT_COUNT_LIMIT = 10000
+READINESS_CACHE_ALIAS = 'default'
+WARMUP_ON_START = os.getenv(
+    'WARMUP_ON_START', default='true').lower() in ('1', 'true')
+
 LANGUAGE_CODE = 'ru-RU'
 
 TIME_ZONE = 'UTC'
@@ -5,3 +5,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+from foodgram.settings import WARMUP_ON_START  # noqa: E402
+
+if WARMUP_ON_START:
+    from api.warmup import warmup
+
+    warmup()
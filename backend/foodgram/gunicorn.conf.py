@@ -0,0 +1,49 @@
+import gc
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', cpu_count * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Каждый поток держит своё постоянное соединение с базой, поэтому
+# workers * threads - это размер пула соединений всех воркеров. Он не
+# должен превышать DB_MAX_CONNECTIONS (max_connections Postgres за
+# вычетом запаса для миграций, админки и команд).
+db_max_connections = int(os.getenv('DB_MAX_CONNECTIONS', 80))
+workers = max(1, min(workers, db_max_connections))
+threads = max(1, min(threads, db_max_connections // workers))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+worker_tmp_dir = '/dev/shm'
+
+# С preload приложение и прогрев (api.warmup) загружаются один раз в
+# мастере, воркеры наследуют готовое состояние через copy-on-write.
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true')
+
+
+def pre_fork(server, worker):
+    """
+    Соединения мастера не должны доставаться воркерам. Объекты мастера
+    переносятся в постоянное поколение сборщика мусора, чтобы его
+    проходы в воркерах не копировали общие страницы памяти.
+    """
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
+        gc.freeze()
+
+
+def child_exit(server, worker):
+    """Метрики завершившегося воркера переносятся в общий архив."""
+    from api.metrics import registry
+
+    registry.retire(worker.pid)
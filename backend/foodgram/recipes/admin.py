@@ -1,12 +1,68 @@
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from api.deletion import enqueue_recipe_deletion
+from api.documents import rebuild_documents
+from api.pagination import EstimatedCountPaginator
+from recipes.models import (ChangeLog, DeletionJob, Favorite, Ingredient,
+                            Recipe, ShoppingCart, Tag)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Список без COUNT(*) по всей таблице: оценка числа строк в пагинаторе
+    и без подсчёта общего числа записей рядом с результатами поиска.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class LinkChangeLogAdmin(LargeTableAdmin):
+    """
+    Связи пользователя с объектом (избранное, список покупок, подписки):
+    добавление, изменение и удаление в админке записываются в журнал
+    изменений в той же транзакции, чтобы их получили клиенты
+    дельта-синхронизации.
+    """
+    change_kind = None
+    object_field = None
+
+    def links(self, queryset):
+        return list(queryset.values_list('user_id', self.object_field))
+
+    def record(self, action, links):
+        ChangeLog.objects.bulk_create([
+            ChangeLog(kind=self.change_kind, action=action,
+                      object_id=object_id, user_id=user_id)
+            for user_id, object_id in links
+        ])
+
+    def save_model(self, request, obj, form, change):
+        old = self.links(type(obj).objects.filter(pk=obj.pk)) if change else []
+        super().save_model(request, obj, form, change)
+        new = [(obj.user_id, getattr(obj, self.object_field))]
+        if old != new:
+            self.record(ChangeLog.REMOVED, old)
+            self.record(ChangeLog.ADDED, new)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            self.record(ChangeLog.REMOVED, self.links(
+                type(obj).objects.filter(pk=obj.pk)))
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            self.record(ChangeLog.REMOVED, self.links(queryset))
+            super().delete_queryset(request, queryset)
 
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    search_fields = ('name',)
+    search_fields = ('^name',)
     ordering = ('name',)
 
 
@@ -19,30 +75,116 @@ class TagAdmin(admin.ModelAdmin):
 
 class RecipeIngredientInline(admin.TabularInline):
     model = Recipe.ingredients.through
+    autocomplete_fields = ('ingredient',)
     extra = 1
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient')
+
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     inlines = (RecipeIngredientInline,)
     list_display = ('author', 'name', 'text', 'get_favorited')
-    search_fields = ('name', 'name', 'tags')
-    ordering = ('author',)
+    list_select_related = ('author',)
+    list_filter = ('tags',)
+    search_fields = ('name', '^author__username', '^author__email')
+    autocomplete_fields = ('author',)
+    ordering = ('-id',)
     empty_value_display = '-пусто-'
+    actions = ('delete_in_background',)
+
+    def get_queryset(self, request):
+        """
+        Число добавлений в избранное считается подзапросом только для
+        строк текущей страницы, без GROUP BY по всей таблице рецептов.
+        """
+        favorites = Favorite.objects.filter(
+            recipe_id=OuterRef('pk')).order_by().values(
+            'recipe_id').annotate(count=Count('id')).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites, output_field=IntegerField()), 0))
 
     def get_favorited(self, obj):
-        return obj.favorites.count()
+        """
+        Сортировки по колонке нет: для неё подзапрос пришлось бы
+        вычислить для всех рецептов, а не только для текущей страницы.
+        """
+        return obj.favorites_count
 
     get_favorited.short_description = 'В избранном'
 
+    def save_related(self, request, form, formsets, change):
+        """
+        Сохранение из админки (в транзакции формы) попадает в журнал
+        изменений, как и через API.
+        """
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.touch([form.instance.id])
+        rebuild_documents([form.instance.id])
+        ChangeLog.objects.record(
+            ChangeLog.RECIPE, ChangeLog.UPDATED if change else
+            ChangeLog.CREATED, [form.instance.id])
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            ChangeLog.objects.record(
+                ChangeLog.RECIPE, ChangeLog.DELETED, [obj.id])
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            ChangeLog.objects.record(
+                ChangeLog.RECIPE, ChangeLog.DELETED,
+                list(queryset.values_list('id', flat=True)))
+            super().delete_queryset(request, queryset)
+
+    def delete_in_background(self, request, queryset):
+        job = enqueue_recipe_deletion(
+            list(queryset.values_list('id', flat=True)), request.user)
+        self.message_user(request, f'Удаление поставлено в очередь: {job}.')
+
+    delete_in_background.short_description = 'Удалить в фоне'
+
+
+class RecipeUserListAdmin(LinkChangeLogAdmin):
+    object_field = 'recipe_id'
+    list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', '^user__email', '^recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('-id',)
+
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
-    ordering = ('user',)
-    search_fields = ('recipe', 'user')
+class FavoriteAdmin(RecipeUserListAdmin):
+    change_kind = ChangeLog.FAVORITE
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    ordering = ('user',)
-    search_fields = ('recipe', 'user')
+class ShoppingCartAdmin(RecipeUserListAdmin):
+    change_kind = ChangeLog.SHOPPING_CART
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'processed', 'total',
+                    'requested_by', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    list_select_related = ('requested_by',)
+    readonly_fields = ('kind', 'object_ids', 'requested_by', 'total',
+                       'processed', 'error', 'started_at', 'heartbeat_at',
+                       'finished_at')
+    actions = ('retry',)
+    ordering = ('-id',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def retry(self, request, queryset):
+        queryset.filter(status=DeletionJob.FAILED).update(
+            status=DeletionJob.PENDING, error='')
+
+    retry.short_description = 'Повторить неудавшиеся'
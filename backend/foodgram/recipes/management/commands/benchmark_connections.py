@@ -0,0 +1,103 @@
+import threading
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from api.loadtesting import percentile
+from api.throttling import throttling_disabled
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает обработку запросов с новым соединением с базой '
+            'на каждый запрос (CONN_MAX_AGE=0) и с постоянными '
+            'соединениями. Запросы выполняются в потоках, как в '
+            'gthread-воркере gunicorn, на текущей базе данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/recipes/?limit=10',
+                            help='Адрес запроса.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Число потоков (соединений в пуле).')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Число запросов в каждом потоке.')
+        parser.add_argument('--max-age', type=int, default=60,
+                            help='CONN_MAX_AGE для постоянных соединений.')
+
+    def handle(self, *args, **options):
+        with throttling_disabled():
+            results = [self.run(options, 0),
+                       self.run(options, options['max_age'])]
+        for result in results:
+            self.stdout.write(
+                'CONN_MAX_AGE={max_age:<4} {rps:>8.1f} rps  p50 {p50:>6.2f}'
+                '  p95 {p95:>6.2f} мс  соединений открыто: {opened}'
+                .format(**result))
+        closed, persistent = results
+        self.stdout.write(self.style.SUCCESS(
+            'Постоянные соединения: x{0:.2f} по пропускной способности, '
+            'p50 меньше на {1:.2f} мс.'.format(
+                persistent['rps'] / closed['rps'],
+                closed['p50'] - persistent['p50'])))
+
+    def run(self, options, max_age):
+        """
+        Тестовый клиент не закрывает соединения по сигналам запроса,
+        поэтому close_old_connections вызывается вокруг каждого запроса,
+        как это делает WSGI-обработчик.
+        """
+        settings_dicts = [
+            connections.databases[alias] for alias in connections]
+        old_max_ages = [
+            settings_dict.get('CONN_MAX_AGE', 0)
+            for settings_dict in settings_dicts]
+        for settings_dict in settings_dicts:
+            settings_dict['CONN_MAX_AGE'] = max_age
+        connections.close_all()
+
+        lock = threading.Lock()
+        opened = []
+        timings = []
+
+        def count(sender, connection, **kwargs):
+            with lock:
+                opened.append(connection.alias)
+
+        def worker():
+            client = Client()
+            local_timings = []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                close_old_connections()
+                client.get(options['path'])
+                close_old_connections()
+                local_timings.append(
+                    (time.perf_counter() - started) * 1000)
+            connections.close_all()
+            with lock:
+                timings.extend(local_timings)
+
+        connection_created.connect(count)
+        threads = [threading.Thread(target=worker)
+                   for _ in range(options['threads'])]
+        started = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            elapsed = time.perf_counter() - started
+            connection_created.disconnect(count)
+            for settings_dict, old_max_age in zip(
+                    settings_dicts, old_max_ages):
+                settings_dict['CONN_MAX_AGE'] = old_max_age
+        return {
+            'max_age': max_age,
+            'rps': len(timings) / elapsed,
+            'p50': percentile(timings, 0.5),
+            'p95': percentile(timings, 0.95),
+            'opened': len(opened),
+        }
@@ -0,0 +1,122 @@
+import json
+import os
+
+from django.core.management import BaseCommand, CommandError
+
+from api.benchmarking import (benchmark_clients, measure, route_paths,
+                              seed_dataset, temporary_database,
+                              write_requests)
+from api.throttling import throttling_disabled
+from foodgram.settings import BENCHMARK_BASELINE
+
+
+class Command(BaseCommand):
+    help = ('Замер времени, числа SQL-запросов и памяти для эндпоинтов API '
+            'на синтетических данных разного объёма с проверкой регрессий '
+            'относительно сохранённого JSON-бейзлайна.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='100,1000',
+            help='Количество рецептов в наборах данных через запятую.')
+        parser.add_argument('--repeats', type=int, default=5)
+        parser.add_argument('--baseline', default=BENCHMARK_BASELINE)
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Сохранить результаты как новый бейзлайн.')
+        parser.add_argument(
+            '--time-tolerance', type=float, default=0.5,
+            help='Допустимый относительный рост времени ответа.')
+        parser.add_argument(
+            '--memory-tolerance', type=float, default=0.5,
+            help='Допустимый относительный рост пиковой памяти.')
+        parser.add_argument(
+            '--query-tolerance', type=int, default=0,
+            help='Допустимый рост числа SQL-запросов.')
+        parser.add_argument(
+            '--queries-only', action='store_true',
+            help='Сравнивать с бейзлайном только статусы и число '
+                 'SQL-запросов: время и память зависят от машины, '
+                 'поэтому в CI проверяются только они.')
+
+    def run_scale(self, scale, repeats):
+        results = {}
+        with temporary_database(), throttling_disabled():
+            seed_dataset(scale)
+            clients = benchmark_clients()
+            for name, mode, path in route_paths():
+                results[f'{name}|{mode}'] = measure(
+                    clients[mode], path, repeats)
+            for (name, mode, method, path, data, undo,
+                 content_type) in write_requests():
+                results[f'{name}|{mode}'] = measure(
+                    clients[mode], path, repeats, method, data, undo,
+                    content_type)
+        return results
+
+    def compare(self, scale, results, baseline, options):
+        regressions = []
+        for key, current in results.items():
+            previous = baseline.get(key)
+            if previous is None:
+                continue
+            if current['status'] != previous['status']:
+                regressions.append(
+                    f'{scale} {key}: статус {previous["status"]} -> '
+                    f'{current["status"]}')
+            if current['queries'] > (previous['queries']
+                                     + options['query_tolerance']):
+                regressions.append(
+                    f'{scale} {key}: SQL-запросов {previous["queries"]} -> '
+                    f'{current["queries"]}')
+            if options['queries_only']:
+                continue
+            if (current['ms'] > previous['ms']
+                    * (1 + options['time_tolerance'])
+                    and current['ms'] - previous['ms'] > 1):
+                regressions.append(
+                    f'{scale} {key}: время {previous["ms"]} мс -> '
+                    f'{current["ms"]} мс')
+            if (current['peak_kb'] > previous['peak_kb']
+                    * (1 + options['memory_tolerance'])
+                    and current['peak_kb'] - previous['peak_kb'] > 64):
+                regressions.append(
+                    f'{scale} {key}: память {previous["peak_kb"]} КБ -> '
+                    f'{current["peak_kb"]} КБ')
+        return regressions
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        elif not options['update_baseline']:
+            raise CommandError(
+                f'Бейзлайн {options["baseline"]} не найден. Запустите '
+                f'команду с --update-baseline.')
+
+        report = {}
+        regressions = []
+        for scale in options['scales'].split(','):
+            results = report[scale] = self.run_scale(
+                int(scale), options['repeats'])
+            self.stdout.write(f'\nРецептов: {scale}')
+            for key, result in results.items():
+                self.stdout.write(
+                    '{0:<48} {status:>4} {ms:>9.2f} мс {queries:>4} SQL '
+                    '{peak_kb:>9.1f} КБ'.format(key, **result))
+            regressions += self.compare(
+                scale, results, baseline.get(scale, {}), options)
+
+        if options['update_baseline']:
+            os.makedirs(os.path.dirname(options['baseline']), exist_ok=True)
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2,
+                          sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(
+                f'Бейзлайн сохранён в {options["baseline"]}.'))
+            return
+        if regressions:
+            raise CommandError(
+                'Обнаружены регрессии:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено.'))
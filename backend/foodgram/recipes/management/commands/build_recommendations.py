@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand
+from django.db.models import Max
+from django.utils import timezone
+
+from api.recommendations import (RecommendationGraph, changed_users,
+                                 store_recommendations)
+from foodgram.settings import RECOMMENDATION_CHUNK_SIZE, RECOMMENDATION_TOP_K
+from recipes.models import ChangeLog
+from users.models import RecommendationBuild
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пакетный расчёт рекомендаций авторов по графу подписок и '
+            'избранному. По умолчанию пересчитываются только пользователи, '
+            'у которых граф изменился после предыдущего расчёта.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать всех пользователей.')
+        parser.add_argument('--top-k', type=int,
+                            default=RECOMMENDATION_TOP_K)
+        parser.add_argument('--chunk-size', type=int,
+                            default=RECOMMENDATION_CHUNK_SIZE,
+                            help='Пользователей в одной транзакции записи.')
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        cursor = ChangeLog.objects.aggregate(last=Max('id'))['last'] or 0
+        previous = RecommendationBuild.objects.first()
+        full = options['full'] or previous is None
+        if full:
+            user_ids = User.objects.order_by('id').values_list(
+                'id', flat=True)
+        else:
+            user_ids = changed_users(previous.cursor, previous.started_at)
+        if not full and not user_ids:
+            self.stdout.write('Изменений с прошлого расчёта нет.')
+            return
+
+        started = time.perf_counter()
+        graph = RecommendationGraph()
+        loaded = time.perf_counter()
+        user_ids = list(user_ids)
+        store_recommendations(graph, user_ids, options['chunk_size'],
+                              options['top_k'])
+        RecommendationBuild.objects.create(
+            full=full, cursor=cursor, users=len(user_ids),
+            started_at=started_at)
+        self.stdout.write(self.style.SUCCESS(
+            '{0} расчёт: {1} пользователей, граф загружен за {2:.1f} с, '
+            'оценки за {3:.1f} с.'.format(
+                'Полный' if full else 'Инкрементальный', len(user_ids),
+                loaded - started, time.perf_counter() - loaded)))
@@ -0,0 +1,44 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from api.benchmarking import (benchmark_clients, large_table_scans,
+                              route_queries, seed_dataset,
+                              temporary_database)
+from api.throttling import throttling_disabled
+
+
+class Command(BaseCommand):
+    help = ('Строит планы EXPLAIN для SQL-запросов эндпоинтов API на '
+            'синтетических данных и завершается ошибкой, если какой-либо '
+            'запрос последовательно сканирует большую таблицу.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Количество рецептов в наборе данных.')
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help='Вывести запросы с последовательным '
+                                 'сканированием целиком.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Проверка планов работает только с PostgreSQL.')
+        with temporary_database(), throttling_disabled():
+            seed_dataset(options['recipes'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            queries = route_queries(benchmark_clients())
+            problems = large_table_scans(queries)
+
+        self.stdout.write(f'Проверено запросов: {len(queries)}')
+        for route, tables, sql in problems:
+            self.stdout.write(self.style.ERROR(
+                f'{route}: последовательное сканирование '
+                f'{", ".join(tables)}'))
+            if options['verbose_plans']:
+                self.stdout.write(f'  {sql}')
+        if problems:
+            raise CommandError(
+                f'Запросов с последовательным сканированием больших таблиц: '
+                f'{len(problems)}')
+        self.stdout.write(self.style.SUCCESS(
+            'Последовательных сканирований больших таблиц нет.'))
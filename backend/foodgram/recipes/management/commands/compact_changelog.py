@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from recipes.models import ChangeLog, ChangeLogCompaction
+
+
+class Command(BaseCommand):
+    help = ('Сжатие журнала изменений: удаляет записи, перекрытые более '
+            'новыми записями о тех же объектах, и при необходимости старые '
+            'записи.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Удалить все записи старше указанного числа дней. '
+                 'Клиенты с более старым курсором получат reset.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Количество записей, удаляемых одним запросом.')
+
+    def delete_in_chunks(self, queryset, chunk_size):
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                return deleted
+            deleted += ChangeLog.objects.filter(id__in=ids).delete()[0]
+
+    def handle(self, *args, **options):
+        newer = ChangeLog.objects.filter(
+            kind=OuterRef('kind'), object_id=OuterRef('object_id'),
+            id__gt=OuterRef('id'))
+        recipes = ChangeLog.objects.filter(
+            kind=ChangeLog.RECIPE
+        ).annotate(superseded=Exists(newer)).filter(superseded=True)
+        members = ChangeLog.objects.exclude(
+            kind=ChangeLog.RECIPE
+        ).annotate(
+            superseded=Exists(newer.filter(user=OuterRef('user')))
+        ).filter(superseded=True)
+        deleted = (self.delete_in_chunks(recipes, options['chunk_size'])
+                   + self.delete_in_chunks(members, options['chunk_size']))
+        if options['days'] is not None:
+            old = ChangeLog.objects.filter(
+                created_at__lt=timezone.now()
+                - timedelta(days=options['days']))
+            watermark = old.aggregate(last=Max('id'))['last']
+            if watermark is not None:
+                ChangeLogCompaction.objects.create(watermark=watermark)
+                deleted += self.delete_in_chunks(
+                    old.filter(id__lte=watermark), options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено записей журнала: {deleted}.'))
@@ -0,0 +1,42 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from api.exporter import export_recipes, parse_since
+from foodgram.settings import EXPORT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка всех рецептов в формате NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Путь к файлу выгрузки или "-" для вывода в stdout.')
+        parser.add_argument(
+            '--since',
+            help='Выгрузить только рецепты, изменённые после этого момента '
+                 '(ISO 8601 или unix-время), и строки об удалённых '
+                 'с тех пор рецептах.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+            help='Количество рецептов, читаемых за один запрос.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_since(options['since'])
+            except ValueError as error:
+                raise CommandError(error)
+        lines = export_recipes(since, options['chunk_size'])
+        if options['output'] == '-':
+            sys.stdout.writelines(lines)
+            return
+        count = 0
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            for line in lines:
+                file.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {count}.'))
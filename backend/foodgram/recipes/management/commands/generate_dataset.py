@@ -0,0 +1,206 @@
+import csv
+import io
+import random
+import time
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand
+from django.db import transaction
+from PIL import Image
+
+from api.catalog import bump_catalog_version
+from api.documents import rebuild_documents
+from api.importer import create_recipes
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#008000', 'dinner'),
+    ('Ужин', '#7366BD', 'supper'),
+)
+PLACEHOLDER_COLORS = ('#E26C2D', '#008000', '#7366BD', '#F4B400',
+                      '#DB4437', '#4285F4', '#795548', '#9E9E9E')
+DISHES = ('Салат', 'Суп', 'Рагу', 'Запеканка', 'Пирог', 'Омлет', 'Паста',
+          'Каша', 'Котлеты', 'Смузи')
+
+
+class ZipfSampler:
+    """Выборка элементов с частотами по закону Ципфа."""
+
+    def __init__(self, rng, population, exponent):
+        self.rng = rng
+        self.population = list(population)
+        rng.shuffle(self.population)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)))
+
+    def sample(self, count):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=count)
+
+    def distinct(self, count, exclude=None):
+        """До count различных элементов (популярные выпадают чаще)."""
+        chosen = set()
+        for _ in range(4):
+            chosen.update(self.sample(count - len(chosen)))
+            chosen.discard(exclude)
+            if len(chosen) >= count:
+                break
+        return chosen
+
+
+class Command(BaseCommand):
+    help = ('Генерация детерминированного синтетического набора данных '
+            'для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Среднее число избранных рецептов.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Среднее число рецептов в списке покупок.')
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='Показатель распределения Ципфа.')
+        parser.add_argument('--password', default='foodgram-load-1',
+                            help='Пароль всех созданных пользователей.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def log(self, message):
+        self.stdout.write(
+            f'[{time.monotonic() - self.started:7.1f} с] {message}')
+
+    def handle(self, *args, **options):
+        self.started = time.monotonic()
+        self.batch_size = options['batch_size']
+        rng = random.Random(options['seed'])
+        exponent = options['zipf']
+
+        ingredients = self.load_catalog()
+        images = self.create_placeholders()
+        users = self.create_users(options['users'], options['seed'],
+                                  options['password'])
+        recipes = self.create_recipes(
+            rng, options['recipes'], ZipfSampler(rng, users, exponent),
+            ZipfSampler(rng, ingredients, exponent),
+            list(Tag.objects.values_list('id', flat=True)), images)
+
+        recipe_sampler = ZipfSampler(rng, recipes, exponent)
+        author_sampler = ZipfSampler(rng, users, exponent)
+        for model, average in ((Favorite, options['favorites']),
+                               (ShoppingCart, options['carts'])):
+            self.bulk_insert(model, (
+                model(user_id=user, recipe_id=recipe)
+                for user in users
+                for recipe in recipe_sampler.distinct(
+                    rng.randint(0, 2 * average))
+            ))
+        self.bulk_insert(Follow, (
+            Follow(user_id=user, author_id=author)
+            for user in users
+            for author in author_sampler.distinct(
+                rng.randint(0, 2 * options['follows']), exclude=user)
+        ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Набор данных создан за {time.monotonic() - self.started:.1f} с.'
+        ))
+
+    def bulk_insert(self, model, objects):
+        batch = []
+        total = 0
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                total += len(model.objects.bulk_create(
+                    batch, ignore_conflicts=True))
+                batch = []
+        total += len(model.objects.bulk_create(batch, ignore_conflicts=True))
+        self.log(f'{model._meta.verbose_name_plural}: {total}')
+
+    def load_catalog(self):
+        with open(f'{settings.BASE_DIR}/data/ingredients.csv', 'r',
+                  encoding='utf-8') as file:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=measurement_unit)
+                 for name, measurement_unit in csv.reader(file)],
+                ignore_conflicts=True)
+        Tag.objects.bulk_create(
+            [Tag(name=name, color=color, slug=slug)
+             for name, color, slug in TAGS],
+            ignore_conflicts=True)
+        bump_catalog_version()
+        ingredients = list(Ingredient.objects.order_by('id').values_list(
+            'id', flat=True))
+        self.log(f'Ингредиентов в каталоге: {len(ingredients)}')
+        return ingredients
+
+    def create_placeholders(self):
+        names = []
+        for number, color in enumerate(PLACEHOLDER_COLORS):
+            name = f'recipe/placeholder_{number}.png'
+            if not default_storage.exists(name):
+                content = io.BytesIO()
+                Image.new('RGB', (64, 64), color).save(content, 'PNG')
+                name = default_storage.save(
+                    name, ContentFile(content.getvalue()))
+            names.append(name)
+        return names
+
+    def create_users(self, count, seed, password):
+        prefix = f'gen{seed}_'
+        password = make_password(password)
+        self.bulk_insert(User, (
+            User(username=f'{prefix}{number}',
+                 email=f'{prefix}{number}@example.com',
+                 first_name='Пользователь', last_name=str(number),
+                 password=password)
+            for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=prefix).order_by('id').values_list(
+            'id', flat=True))
+
+    def create_recipes(self, rng, count, authors, ingredients, tags, images):
+        recipe_ids = []
+        for offset in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - offset)
+            recipes = [
+                Recipe(author_id=author,
+                       name=f'{rng.choice(DISHES)} №{offset + number + 1}',
+                       text='Синтетический рецепт для нагрузочных тестов.',
+                       cooking_time=rng.randint(5, 180),
+                       image=rng.choice(images))
+                for number, author in enumerate(authors.sample(size))
+            ]
+            with transaction.atomic():
+                recipes = create_recipes(recipes)
+                Recipe.tags.through.objects.bulk_create([
+                    Recipe.tags.through(recipe_id=recipe.id, tag_id=tag)
+                    for recipe in recipes
+                    for tag in rng.sample(tags, rng.randint(1, len(tags)))
+                ])
+                RecipeIngredient.objects.bulk_create([
+                    RecipeIngredient(recipe_id=recipe.id,
+                                     ingredient_id=ingredient,
+                                     amount=rng.randint(1, 500))
+                    for recipe in recipes
+                    for ingredient in sorted(ingredients.distinct(
+                        rng.randint(3, 12)))
+                ])
+                rebuild_documents([recipe.id for recipe in recipes])
+            recipe_ids.extend(recipe.id for recipe in recipes)
+            self.log(f'Рецептов: {len(recipe_ids)}')
+        return recipe_ids
@@ -0,0 +1,47 @@
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+from api.importer import RecipeImporter
+from foodgram.settings import IMPORT_BATCH_SIZE
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт рецептов из файла NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Путь к файлу NDJSON или "-" для чтения из stdin.')
+        parser.add_argument(
+            '--author',
+            help='E-mail автора для строк, в которых он не указан.')
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Количество рецептов в одной пачке.')
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            author = User.objects.filter(email=options['author']).first()
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден.')
+        importer = RecipeImporter(author, options['batch_size'])
+        if options['path'] == '-':
+            report = importer.run(sys.stdin)
+        else:
+            with open(options['path'], 'r', encoding='utf-8') as file:
+                report = importer.run(file)
+
+        for error in report['errors']:
+            self.stderr.write('Строка {0}: {1}'.format(
+                error['line'],
+                json.dumps(error['errors'], ensure_ascii=False)))
+        self.stdout.write(self.style.SUCCESS(
+            'Импортировано рецептов: {created} из {lines} за {seconds} с '
+            '({rate} рецептов/с), ошибок: {0}.'.format(
+                len(report['errors']), **report)))
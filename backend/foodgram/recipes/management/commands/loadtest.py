@@ -0,0 +1,61 @@
+import json
+
+from django.core.management import BaseCommand, CommandError
+
+from api.loadtesting import LoadTest
+from foodgram.settings import LOADTEST_CONFIG
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест запущенного сервера по сценариям '
+            'пользователей фронтенда с поиском точки насыщения. Данные '
+            'и пользователей готовит команда generate_dataset. Для '
+            'замера ёмкости сервер запускается с THROTTLE_ENABLED=false, '
+            'иначе пропускную способность ограничат лимиты частоты.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--config', default=LOADTEST_CONFIG,
+                            help='JSON-файл со сценариями и их весами.')
+        parser.add_argument('--base-url', help='Адрес тестируемого сервера.')
+        parser.add_argument(
+            '--concurrency',
+            help='Ступени числа потоков через запятую, например 1,4,16.')
+        parser.add_argument('--step-seconds', type=int,
+                            help='Длительность одной ступени.')
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        with open(options['config'], encoding='utf-8') as file:
+            config = json.load(file)
+        if options['base_url']:
+            config['base_url'] = options['base_url']
+        if options['concurrency']:
+            config['ramp']['concurrency'] = [
+                int(value) for value in options['concurrency'].split(',')]
+        if options['step_seconds']:
+            config['ramp']['step_seconds'] = options['step_seconds']
+
+        try:
+            report = LoadTest(config, log=self.stdout.write).run()
+        except (OSError, RuntimeError) as error:
+            raise CommandError(
+                f'Сервер {config["base_url"]} недоступен: {error}')
+
+        for step in report['steps']:
+            self.stdout.write(f'\nПотоков: {step["concurrency"]}')
+            for name, result in step['endpoints'].items():
+                self.stdout.write(
+                    '{0:<34} {requests:>7} {rps:>8.1f} rps  p50 {p50:>7.1f}'
+                    '  p95 {p95:>7.1f}  p99 {p99:>7.1f} мс  5xx {errors}'
+                    .format(name, **result))
+        saturation = report['saturation']
+        if saturation is None:
+            self.stdout.write(self.style.WARNING(
+                '\nНасыщение не достигнуто, увеличьте ступени нагрузки.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                '\nТочка насыщения: {concurrency} потоков, {rps} rps, '
+                'p95 {p95} мс.'.format(**saturation)))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
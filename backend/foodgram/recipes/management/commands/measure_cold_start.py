@@ -0,0 +1,72 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from foodgram.settings import BASE_DIR
+
+PROBE = '''
+import json
+import sys
+import time
+
+started = time.perf_counter()
+import foodgram.wsgi  # noqa: E402,F401
+result = {'import': (time.perf_counter() - started) * 1000}
+
+from django.test import Client  # noqa: E402
+
+client = Client()
+for path in sys.argv[1:]:
+    timings = []
+    for _ in range(2):
+        started = time.perf_counter()
+        response = client.get(path)
+        response.content
+        timings.append((time.perf_counter() - started) * 1000)
+    result[path] = timings
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    help = ('Время запуска воркера (импорт foodgram.wsgi) и первого '
+            'запроса без прогрева и с прогревом. Каждый замер выполняется '
+            'в новом процессе интерпретатора.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--paths', default='/api/recipes/,/api/tags/,/api/ingredients/',
+            help='Адреса первых запросов через запятую.')
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Число запусков для каждого режима.')
+
+    def probe(self, warmup, paths):
+        env = {**os.environ, 'WARMUP_ON_START': '1' if warmup else '0'}
+        process = subprocess.run(
+            [sys.executable, '-c', PROBE, *paths], cwd=BASE_DIR, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        if process.returncode:
+            raise CommandError(process.stderr)
+        return json.loads(process.stdout.splitlines()[-1])
+
+    def handle(self, *args, **options):
+        paths = options['paths'].split(',')
+        for warmup in (False, True):
+            runs = [self.probe(warmup, paths)
+                    for _ in range(options['runs'])]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                'С прогревом' if warmup else 'Без прогрева'))
+            self.stdout.write('{0:<40} {1:>9.1f} мс'.format(
+                'импорт приложения',
+                statistics.median(run['import'] for run in runs)))
+            for path in paths:
+                self.stdout.write(
+                    '{0:<40} {1:>9.1f} мс, повторный {2:>7.1f} мс'.format(
+                        path,
+                        statistics.median(run[path][0] for run in runs),
+                        statistics.median(run[path][1] for run in runs)))
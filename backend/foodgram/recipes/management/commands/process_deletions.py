@@ -0,0 +1,38 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from api.deletion import claim_job, process_job
+from foodgram.settings import DELETION_CHUNK_SIZE, DELETION_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = ('Обработчик очереди фоновых удалений пользователей и рецептов. '
+            'Несколько обработчиков могут работать одновременно.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить все ожидающие задания и завершиться.')
+        parser.add_argument(
+            '--interval', type=float, default=DELETION_POLL_INTERVAL,
+            help='Пауза между проверками пустой очереди, секунд.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=DELETION_CHUNK_SIZE,
+            help='Количество рецептов, удаляемых одной транзакцией.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+            self.stdout.write(f'Задание {job.id}: {job.kind} {job.ids}')
+            process_job(job, options['chunk_size'])
+            self.stdout.write(
+                f'Задание {job.id}: {job.status}, удалено рецептов '
+                f'{job.processed} из {job.total}')
@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand
+
+from api.documents import REBUILD_CHUNK_SIZE, rebuild_documents
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Пересборка готовых документов рецептов (RecipeDocument), '
+            'например после миграции, смены MEDIA_URL или включения '
+            'FAST_READ_SERIALIZERS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Собрать документы только для рецептов без документа.')
+        parser.add_argument('--chunk-size', type=int,
+                            default=REBUILD_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.order_by('id')
+        if options['missing']:
+            recipes = recipes.filter(document__isnull=True)
+        ids = list(recipes.values_list('id', flat=True))
+        chunk_size = options['chunk_size']
+        for offset in range(0, len(ids), chunk_size):
+            rebuild_documents(ids[offset:offset + chunk_size], chunk_size,
+                              force=True)
+            self.stdout.write(
+                f'Документов: {min(offset + chunk_size, len(ids))}'
+                f'/{len(ids)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано документов: {len(ids)}.'))
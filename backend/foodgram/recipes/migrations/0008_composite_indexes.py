@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-19 14:46
+
+from django.db import migrations, models
+
+MODEL_INDEXES = (
+    ('favorite', models.Index(fields=['user', 'recipe'], name='favorite_user_recipe')),
+    ('recipe', models.Index(fields=['-pub_date', 'author', 'name'], name='recipe_pub_date_author_name')),
+    ('recipe', models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date')),
+    ('shoppingcart', models.Index(fields=['user', 'recipe'], name='shoppingcart_user_recipe')),
+)
+
+POSTGRES_INDEXES = {
+    'favorite_user_recipe':
+        'recipes_favorite (user_id, recipe_id)',
+    'recipe_pub_date_author_name':
+        'recipes_recipe (pub_date DESC, author_id, name)',
+    'recipe_author_pub_date':
+        'recipes_recipe (author_id, pub_date DESC)',
+    'shoppingcart_user_recipe':
+        'recipes_shoppingcart (user_id, recipe_id)',
+    'recipe_tags_tag_recipe':
+        'recipes_recipe_tags (tag_id, recipe_id)',
+    'recipeingredient_recipe_covering':
+        'recipes_recipeingredient (recipe_id) INCLUDE (ingredient_id, amount)',
+    'ingredient_name_upper_prefix':
+        'recipes_ingredient (UPPER(name::text) text_pattern_ops)',
+}
+
+
+def create_indexes(apps, schema_editor):
+    """
+    В Postgres все индексы строятся с CONCURRENTLY, не блокируя запись
+    в таблицы. Последние три нельзя описать в Meta в Django 2.2: по
+    автоматической таблице тэгов, покрывающий (INCLUDE) и по выражению.
+    В остальных базах создаются только индексы из Meta.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        for model_name, index in MODEL_INDEXES:
+            schema_editor.add_index(
+                apps.get_model('recipes', model_name), index)
+        return
+    for name, definition in POSTGRES_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        for model_name, index in MODEL_INDEXES:
+            schema_editor.remove_index(
+                apps.get_model('recipes', model_name), index)
+        return
+    for name in POSTGRES_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0007_recipedocument'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=index)
+                for model_name, index in MODEL_INDEXES
+            ],
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-19 15:04
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def initial_watermark(apps, schema_editor):
+    """
+    Записи, удалённые сжатием до появления границы, лежат ниже самой
+    старой оставшейся записи журнала.
+    """
+    ChangeLog = apps.get_model('recipes', 'ChangeLog')
+    first = ChangeLog.objects.aggregate(first=Min('id'))['first']
+    if first is not None and first > 1:
+        apps.get_model('recipes', 'ChangeLogCompaction').objects.create(
+            watermark=first - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_deletionjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogCompaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermark', models.BigIntegerField(verbose_name='Граница удаления')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата сжатия')),
+            ],
+            options={
+                'verbose_name': 'Сжатие журнала',
+                'verbose_name_plural': 'Сжатия журнала',
+                'ordering': ('-watermark',),
+            },
+        ),
+        migrations.RunPython(initial_watermark, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-19 18:20
+
+from django.db import migrations, models
+
+
+def create_revision(apps, schema_editor):
+    apps.get_model('recipes', 'CatalogRevision').objects.create(
+        pk=1, number=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_changelogcompaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.BigIntegerField(default=0, verbose_name='Номер версии')),
+            ],
+            options={
+                'verbose_name': 'Версия справочников',
+                'verbose_name_plural': 'Версии справочников',
+            },
+        ),
+        migrations.RunPython(create_revision, migrations.RunPython.noop),
+    ]
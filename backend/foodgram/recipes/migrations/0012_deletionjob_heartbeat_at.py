@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-19 18:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_started_at(apps, schema_editor):
+    """Выполняемые задания отсчитывают время без отчёта от начала."""
+    apps.get_model('recipes', 'DeletionJob').objects.filter(
+        status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_catalogrevision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletionjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последний отчёт'),
+        ),
+        migrations.RunPython(copy_started_at, migrations.RunPython.noop),
+    ]
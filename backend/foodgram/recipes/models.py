@@ -1,11 +1,24 @@
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 
 from recipes.validators import color_validator, slug_validator
 
 User = get_user_model()
 
 
+class RecipeManager(models.Manager):
+
+    def touch(self, ids):
+        """
+        Обновляет дату изменения рецептов. Изменение тэгов и ингредиентов
+        не сохраняет сам рецепт, а инкрементальный экспорт отбирает
+        рецепты по updated_at.
+        """
+        return self.filter(id__in=ids).update(updated_at=timezone.now())
+
+
 class Recipe(models.Model):
 
     name = models.CharField(verbose_name='Названия', max_length=100)
@@ -21,11 +34,21 @@ class Recipe(models.Model):
         verbose_name='Изображение', upload_to='recipe/')
     pub_date = models.DateTimeField(auto_now_add=True,
                                     verbose_name='Дата публикации')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True,
+                                      verbose_name='Дата изменения')
+
+    objects = RecipeManager()
 
     class Meta:
         ordering = ('-pub_date', 'author', 'name')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date', 'author', 'name'],
+                         name='recipe_pub_date_author_name'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date'),
+        ]
 
     def __str__(self):
         return self.name
@@ -119,6 +142,10 @@ class Favorite(RecipeUserList):
                 name='unique_fav_list_user'
             )
         ]
+        indexes = [
+            models.Index(fields=['user', 'recipe'],
+                         name='favorite_user_recipe'),
+        ]
 
     def __str__(self):
         return (f'@{self.user.username} добавил '
@@ -136,6 +163,211 @@ class ShoppingCart(RecipeUserList):
                 name='unique_cart_list_user'
             )
         ]
+        indexes = [
+            models.Index(fields=['user', 'recipe'],
+                         name='shoppingcart_user_recipe'),
+        ]
 
     def __str__(self):
         return f'Список покупок для {self.recipe.name[:25]}'
+
+
+class ChangeLogManager(models.Manager):
+
+    def record(self, kind, action, ids, user=None):
+        """Добавляет в журнал записи об изменении объектов с id из ids."""
+        return self.bulk_create([
+            self.model(kind=kind, action=action, object_id=pk, user=user)
+            for pk in ids
+        ])
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений для дельта-синхронизации клиентов.
+
+    Записи о рецептах общие (user не задан), записи об избранном,
+    списке покупок и подписках относятся к конкретному пользователю.
+    Записи только добавляются; id служит монотонным курсором.
+    """
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    FOLLOW = 'follow'
+    KINDS = ((RECIPE, RECIPE), (FAVORITE, FAVORITE),
+             (SHOPPING_CART, SHOPPING_CART), (FOLLOW, FOLLOW))
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ADDED = 'added'
+    REMOVED = 'removed'
+    ACTIONS = ((CREATED, CREATED), (UPDATED, UPDATED), (DELETED, DELETED),
+               (ADDED, ADDED), (REMOVED, REMOVED))
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, null=True, blank=True,
+                             on_delete=models.CASCADE,
+                             verbose_name='Пользователь',
+                             related_name='changes')
+    kind = models.CharField(verbose_name='Объект', max_length=16,
+                            choices=KINDS)
+    action = models.CharField(verbose_name='Действие', max_length=8,
+                              choices=ACTIONS)
+    object_id = models.PositiveIntegerField(verbose_name='id объекта')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True,
+                                      verbose_name='Дата изменения')
+
+    objects = ChangeLogManager()
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(fields=['user', 'id'], name='changelog_user_id'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} {self.action}'
+
+
+class ChangeLogCompaction(models.Model):
+    """
+    Запуск сжатия журнала, удалившего старые записи. Записи с id не
+    больше watermark могли быть удалены без замены более новыми, поэтому
+    клиенту с курсором меньше watermark нужен reset.
+    """
+    watermark = models.BigIntegerField(verbose_name='Граница удаления')
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Дата сжатия')
+
+    class Meta:
+        ordering = ('-watermark',)
+        verbose_name = 'Сжатие журнала'
+        verbose_name_plural = 'Сжатия журнала'
+
+    def __str__(self):
+        return f'{self.watermark}'
+
+
+class CatalogRevisionManager(models.Manager):
+    ROW = 1
+
+    def current(self):
+        return self.filter(pk=self.ROW).values_list(
+            'number', flat=True).first() or 0
+
+    def bump(self):
+        """
+        Увеличивает номер версии в текущей транзакции: новая версия
+        становится видна всем процессам вместе с изменёнными данными.
+        """
+        if not self.filter(pk=self.ROW).update(number=F('number') + 1):
+            self.create(pk=self.ROW, number=1)
+
+
+class CatalogRevision(models.Model):
+    """
+    Номер версии справочников ингредиентов и тэгов (единственная строка).
+    По нему пересобираются готовые снимки справочников и строятся их ETag.
+    """
+    number = models.BigIntegerField(default=0, verbose_name='Номер версии')
+
+    objects = CatalogRevisionManager()
+
+    class Meta:
+        verbose_name = 'Версия справочников'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.number}'
+
+
+class RecipeDocument(models.Model):
+    """
+    Готовый JSON-документ рецепта без полей, зависящих от пользователя.
+
+    Пересобирается в той же транзакции, что и изменение рецепта, его
+    автора, тэгов или ингредиентов, поэтому чтение рецепта - одна строка.
+    """
+    recipe = models.OneToOneField(Recipe, primary_key=True,
+                                  on_delete=models.CASCADE,
+                                  verbose_name='Рецепт',
+                                  related_name='document')
+    body = models.TextField(verbose_name='Документ')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата сборки')
+
+    class Meta:
+        verbose_name = 'Документ рецепта'
+        verbose_name_plural = 'Документы рецептов'
+
+    def __str__(self):
+        return f'Документ рецепта {self.recipe_id}'
+
+
+class DeletionJobManager(models.Manager):
+
+    def enqueue(self, kind, ids, requested_by=None):
+        return self.create(kind=kind, object_ids=','.join(map(str, ids)),
+                           requested_by=requested_by)
+
+
+class DeletionJob(models.Model):
+    """
+    Фоновое удаление пользователя со всеми рецептами или набора рецептов.
+
+    Задания выполняет команда process_deletions: порциями, каждая в
+    отдельной короткой транзакции, с отчётом о ходе в total/processed.
+    После каждой порции обновляется heartbeat_at; задание без отчёта
+    дольше DELETION_JOB_TIMEOUT считается брошенным.
+    """
+    USER = 'user'
+    RECIPES = 'recipes'
+    KINDS = ((USER, USER), (RECIPES, RECIPES))
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = ((PENDING, PENDING), (RUNNING, RUNNING), (DONE, DONE),
+                (FAILED, FAILED))
+
+    kind = models.CharField(verbose_name='Объект', max_length=8,
+                            choices=KINDS)
+    object_ids = models.TextField(verbose_name='id объектов')
+    status = models.CharField(verbose_name='Статус', max_length=8,
+                              choices=STATUSES, default=PENDING,
+                              db_index=True)
+    requested_by = models.ForeignKey(User, null=True, blank=True,
+                                     on_delete=models.SET_NULL,
+                                     verbose_name='Инициатор',
+                                     related_name='deletion_jobs')
+    total = models.PositiveIntegerField(verbose_name='Всего рецептов',
+                                        default=0)
+    processed = models.PositiveIntegerField(verbose_name='Удалено рецептов',
+                                            default=0)
+    error = models.TextField(verbose_name='Ошибка', blank=True)
+    created_at = models.DateTimeField(auto_now_add=True,
+                                      verbose_name='Дата создания')
+    started_at = models.DateTimeField(null=True, blank=True,
+                                      verbose_name='Начало')
+    heartbeat_at = models.DateTimeField(null=True, blank=True,
+                                        verbose_name='Последний отчёт')
+    finished_at = models.DateTimeField(null=True, blank=True,
+                                       verbose_name='Окончание')
+
+    objects = DeletionJobManager()
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Задание на удаление'
+        verbose_name_plural = 'Задания на удаление'
+
+    def __str__(self):
+        return f'{self.kind} {self.object_ids[:30]} {self.status}'
+
+    @property
+    def ids(self):
+        return [int(pk) for pk in self.object_ids.split(',') if pk]
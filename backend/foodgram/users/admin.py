@@ -1,20 +1,52 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 
-from users.models import Follow
+from api.deletion import enqueue_user_deletion
+from recipes.admin import LargeTableAdmin, LinkChangeLogAdmin
+from recipes.models import ChangeLog
+from users.models import AuthorRecommendation, Follow, RecommendationBuild
 
 User = get_user_model()
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(LargeTableAdmin):
     list_display = ('email', 'username', 'first_name', 'last_name')
-    search_fields = ('username', 'email')
+    search_fields = ('^username', '^email')
     ordering = ('email',)
+    actions = ('delete_in_background',)
+
+    def delete_in_background(self, request, queryset):
+        for user in queryset:
+            enqueue_user_deletion(user, request.user)
+        self.message_user(request, 'Удаление пользователей поставлено в '
+                                   'очередь.')
+
+    delete_in_background.short_description = 'Удалить в фоне'
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LinkChangeLogAdmin):
+    change_kind = ChangeLog.FOLLOW
+    object_field = 'author_id'
     list_display = ('id', 'user', 'author')
-    search_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('^user__username', '^user__email',
+                     '^author__username', '^author__email')
+    autocomplete_fields = ('user', 'author')
     ordering = ('-id',)
+
+
+@admin.register(AuthorRecommendation)
+class AuthorRecommendationAdmin(LargeTableAdmin):
+    list_display = ('user', 'rank', 'author', 'score')
+    list_select_related = ('user', 'author')
+    search_fields = ('^user__username', '^user__email')
+    raw_id_fields = ('user', 'author')
+    ordering = ('-id',)
+
+
+@admin.register(RecommendationBuild)
+class RecommendationBuildAdmin(admin.ModelAdmin):
+    list_display = ('id', 'full', 'users', 'cursor', 'started_at',
+                    'finished_at')
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+FIELDS = ('username', 'first_name', 'last_name')
+
+
+def index_name(field):
+    return f'users_user_{field}_upper_prefix'
+
+
+def create_indexes(apps, schema_editor):
+    """
+    Индексы по UPPER(поле) для поиска по началу строки (istartswith).
+    В Django 2.2 нет индексов по выражениям, поэтому они создаются
+    вручную и только в Postgres.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name(field)} '
+            f'ON users_user (UPPER({field}::text) text_pattern_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in FIELDS:
+        schema_editor.execute(
+            f'DROP INDEX CONCURRENTLY IF EXISTS {index_name(field)}')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.16 on 2026-10-19 14:46
+
+from django.db import migrations, models
+
+INDEX = models.Index(fields=['user', '-id'], name='follow_user_id')
+
+
+def create_index(apps, schema_editor):
+    """
+    В Postgres индекс строится с CONCURRENTLY, не блокируя запись
+    в таблицу подписок.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.add_index(apps.get_model('users', 'follow'), INDEX)
+        return
+    schema_editor.execute(
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS follow_user_id '
+        'ON users_follow (user_id, id DESC)')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.remove_index(apps.get_model('users', 'follow'), INDEX)
+        return
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS follow_user_id')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('users', '0002_user_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_index, drop_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='follow', index=INDEX),
+            ],
+        ),
+    ]
@@ -78,9 +78,68 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F("author")),
             ),
         ]
+        indexes = [
+            models.Index(fields=['user', '-id'], name='follow_user_id'),
+        ]
 
     def __str__(self):
         return f'@{self.user.username} подписан на @{self.author.username}'
 
     def get_email_field_name(self):
         return self.author.email
+
+
+class AuthorRecommendation(models.Model):
+    """
+    Рекомендованный пользователю автор. Таблицу заполняет команда
+    build_recommendations, эндпоинт рекомендаций только читает её.
+    """
+    user = models.ForeignKey(User, verbose_name='Пользователь',
+                             on_delete=models.CASCADE,
+                             related_name='recommendations')
+    author = models.ForeignKey(User, verbose_name='Автор',
+                               on_delete=models.CASCADE,
+                               related_name='recommended_to')
+    score = models.FloatField(verbose_name='Оценка')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+
+    class Meta:
+        ordering = ('user', 'rank')
+        verbose_name = 'Рекомендация автора'
+        verbose_name_plural = 'Рекомендации авторов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_author_recommendation',
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', 'rank'],
+                         name='recommendation_user_rank'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.author_id} ({self.score:.3f})'
+
+
+class RecommendationBuild(models.Model):
+    """
+    Запуск расчёта рекомендаций. cursor - последний id журнала
+    изменений, учтённый расчётом: следующий инкрементальный запуск
+    пересчитывает только пользователей с более новыми изменениями.
+    """
+    full = models.BooleanField(verbose_name='Полный расчёт')
+    cursor = models.BigIntegerField(verbose_name='Курсор журнала')
+    users = models.PositiveIntegerField(verbose_name='Пользователей',
+                                        default=0)
+    started_at = models.DateTimeField(verbose_name='Начало')
+    finished_at = models.DateTimeField(auto_now_add=True,
+                                       verbose_name='Окончание')
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Расчёт рекомендаций'
+        verbose_name_plural = 'Расчёты рекомендаций'
+
+    def __str__(self):
+        return f'{self.finished_at:%Y-%m-%d %H:%M} {self.users}'
@@ -0,0 +1,29 @@
+import tempfile
+
+import pytest
+from django.test.utils import override_settings
+
+from api.benchmarking import seed_dataset
+from api.throttling import throttling_disabled
+
+DATASET_RECIPES = 60
+
+
+@pytest.fixture(scope='session')
+def media_root():
+    with tempfile.TemporaryDirectory() as directory:
+        with override_settings(MEDIA_ROOT=directory):
+            yield directory
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker, media_root):
+    """Тестовая база один раз заполняется синтетическим набором данных."""
+    with django_db_blocker.unblock():
+        seed_dataset(DATASET_RECIPES)
+
+
+@pytest.fixture(autouse=True)
+def no_throttling():
+    with throttling_disabled():
+        yield
@@ -0,0 +1,58 @@
+import pytest
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+
+from recipes.models import ChangeLog, Favorite, Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def request_():
+    request = RequestFactory().post('/admin/')
+    request.user = User.objects.filter(is_superuser=True).first() or \
+        User.objects.create(username='admin', email='admin@example.com',
+                            is_staff=True, is_superuser=True)
+    return request
+
+
+def entries(kind, action):
+    return list(ChangeLog.objects.filter(kind=kind, action=action)
+                .values_list('user_id', 'object_id'))
+
+
+def test_recipe_deletions_are_recorded(request_):
+    recipe_admin = site._registry[Recipe]
+    ids = list(Recipe.objects.order_by('id').values_list('id', flat=True)[:3])
+    recipe_admin.delete_model(request_, Recipe.objects.get(id=ids[0]))
+    recipe_admin.delete_queryset(request_, Recipe.objects.filter(id__in=ids))
+    assert sorted(entries(ChangeLog.RECIPE, ChangeLog.DELETED)) == [
+        (None, ids[0]), (None, ids[1]), (None, ids[2])]
+
+
+def test_link_changes_are_recorded(request_):
+    favorite_admin = site._registry[Favorite]
+    user = User.objects.create(username='admin_link_user',
+                               email='admin_link_user@example.com')
+    first, second = Recipe.objects.order_by('id')[:2]
+    favorite = Favorite(user=user, recipe=first)
+    favorite_admin.save_model(request_, favorite, None, False)
+    favorite.recipe = second
+    favorite_admin.save_model(request_, favorite, None, True)
+    favorite_admin.delete_model(request_, favorite)
+    assert entries(ChangeLog.FAVORITE, ChangeLog.ADDED) == [
+        (user.id, first.id), (user.id, second.id)]
+    assert entries(ChangeLog.FAVORITE, ChangeLog.REMOVED) == [
+        (user.id, first.id), (user.id, second.id)]
+
+
+def test_follow_deletions_are_recorded(request_):
+    follows = list(Follow.objects.order_by('id')[:2])
+    site._registry[Follow].delete_queryset(
+        request_, Follow.objects.filter(id__in=[f.id for f in follows]))
+    assert sorted(entries(ChangeLog.FOLLOW, ChangeLog.REMOVED)) == sorted(
+        (follow.user_id, follow.author_id) for follow in follows)
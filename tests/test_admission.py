@@ -0,0 +1,53 @@
+import pytest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+
+from api.admission import SlotLimiter
+from api.middleware import AdmissionControlMiddleware
+
+# Закрытие ответа отправляет request_finished, который закрывает
+# соединения с базой.
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return SlotLimiter(str(tmp_path), 1)
+
+
+def middleware(limiter, view):
+    middleware = AdmissionControlMiddleware(view)
+    middleware.limiter = limiter
+    return middleware
+
+
+def test_slot_is_released_after_response(limiter):
+    response = middleware(limiter, lambda request: HttpResponse('ok'))(
+        RequestFactory().get('/api/recipes/'))
+    assert response.status_code == 200
+    assert limiter.held == set()
+
+
+def test_streaming_response_holds_slot_until_close(limiter):
+    def view(request):
+        return StreamingHttpResponse(iter([b'{}\n', b'{}\n']))
+
+    handler = middleware(limiter, view)
+    response = handler(RequestFactory().get('/api/recipes/export/'))
+    assert limiter.held == {0}
+    assert handler(
+        RequestFactory().get('/api/recipes/')).status_code == 503
+    b''.join(response.streaming_content)
+    response.close()
+    assert limiter.held == set()
+    response.close()
+    assert limiter.held == set()
+
+
+def test_slot_is_released_on_error(limiter):
+    def view(request):
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        middleware(limiter, view)(RequestFactory().get('/api/recipes/'))
+    assert limiter.held == set()
@@ -0,0 +1,31 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+def test_cached_user_does_not_load_deferred_fields():
+    """
+    Повторный запрос /api/users/me/ берёт пользователя из кэша и не
+    догружает поля, которые выводит сериализатор.
+    """
+    user = User.objects.create(username='cached_user', first_name='Имя',
+                               last_name='Фамилия',
+                               email='cached_user@example.com')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION='Token {0}'.format(
+        Token.objects.create(user=user).key))
+    client.get('/api/users/me/')
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/users/me/')
+    assert response.status_code == 200
+    assert response.data['first_name'] == 'Имя'
+    assert response.data['last_name'] == 'Фамилия'
+    assert not [query['sql'] for query in queries
+                if 'users_user' in query['sql']]
@@ -0,0 +1,48 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from api.views import apply_batch, create_links
+from recipes.models import ChangeLog, Favorite, Recipe
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(username='batch_user',
+                               email='batch_user@example.com')
+
+
+@pytest.fixture
+def ids():
+    return list(Recipe.objects.order_by('id').values_list('id', flat=True)[:3])
+
+
+def test_concurrently_created_links_are_not_reported(user, ids):
+    """
+    Связь, появившаяся после чтения существующих, не считается
+    созданной этим запросом.
+    """
+    Favorite.objects.create(user=user, recipe_id=ids[1])
+    assert create_links(Favorite, 'recipe_id', user, ids) == [ids[0], ids[2]]
+    assert Favorite.objects.filter(user=user).count() == 3
+
+
+def test_batch_reports_and_logs_only_changed_rows(user, ids):
+    Favorite.objects.create(user=user, recipe_id=ids[0])
+    result = apply_batch(Favorite, 'recipe', Recipe.objects.all(), user,
+                         add=[ids[0], ids[1]], remove=[ids[2]])
+    assert result == {
+        'add': [{'id': ids[0], 'status': 'exists'},
+                {'id': ids[1], 'status': 'created'}],
+        'remove': [{'id': ids[2], 'status': 'not_found'}],
+    }
+    result = apply_batch(Favorite, 'recipe', Recipe.objects.all(), user,
+                         add=[], remove=[ids[0], ids[2]])
+    assert result['remove'] == [{'id': ids[0], 'status': 'deleted'},
+                                {'id': ids[2], 'status': 'not_found'}]
+    log = ChangeLog.objects.filter(kind=ChangeLog.FAVORITE, user=user)
+    assert list(log.values_list('action', 'object_id').order_by('id')) == [
+        (ChangeLog.ADDED, ids[1]), (ChangeLog.REMOVED, ids[0])]
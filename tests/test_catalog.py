@@ -0,0 +1,33 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api import catalog
+from recipes.models import Tag
+
+pytestmark = pytest.mark.django_db
+
+
+def etag(path='/api/tags/'):
+    return APIClient().get(path)['ETag']
+
+
+def test_catalog_change_updates_etag():
+    before = etag()
+    tag = Tag.objects.first()
+    tag.name += ' (изменено)'
+    tag.save()
+    after = etag()
+    assert after != before
+    assert tag.name.encode() in APIClient().get('/api/tags/').content
+
+
+def test_version_is_shared_between_processes():
+    """
+    Снимок, собранный другим процессом (пустой словарь снимков),
+    получает ту же версию и тот же ETag.
+    """
+    before = etag()
+    catalog.snapshots.clear()
+    assert etag() == before
+    response = APIClient().get('/api/tags/', HTTP_IF_NONE_MATCH=before)
+    assert response.status_code == 304
@@ -0,0 +1,52 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from api.deletion import (JobLostError, claim_job, enqueue_recipe_deletion,
+                          heartbeat, process_job)
+from foodgram.settings import DELETION_JOB_TIMEOUT
+from recipes.models import DeletionJob, Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def job():
+    ids = list(Recipe.objects.order_by('id').values_list('id', flat=True)[:5])
+    return enqueue_recipe_deletion(ids)
+
+
+def make_stale(job):
+    DeletionJob.objects.filter(pk=job.pk).update(
+        heartbeat_at=timezone.now() - timedelta(
+            seconds=DELETION_JOB_TIMEOUT + 1))
+
+
+def test_job_reports_heartbeat(job):
+    claimed = claim_job()
+    assert claimed.pk == job.pk
+    process_job(claimed, chunk_size=2)
+    job.refresh_from_db()
+    assert job.status == DeletionJob.DONE
+    assert job.processed == job.total == 5
+    assert job.heartbeat_at >= job.started_at
+    assert not Recipe.objects.filter(id__in=job.ids).exists()
+
+
+def test_running_job_with_heartbeat_is_not_reclaimed(job):
+    claim_job()
+    assert claim_job() is None
+
+
+def test_reclaimed_job_stops_previous_worker(job):
+    first = claim_job()
+    make_stale(first)
+    second = claim_job()
+    assert second.pk == first.pk
+    with pytest.raises(JobLostError):
+        heartbeat(first)
+    process_job(first)
+    job.refresh_from_db()
+    assert job.status == DeletionJob.RUNNING
+    assert job.processed == 0
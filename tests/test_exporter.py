@@ -0,0 +1,32 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from api.exporter import export_recipes
+from recipes.models import ChangeLog, Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+def test_since_export_includes_deleted_recipes():
+    since = timezone.now() - timedelta(seconds=1)
+    Recipe.objects.update(updated_at=since - timedelta(hours=1))
+    updated, deleted = Recipe.objects.order_by('id')[:2]
+    deleted_id = deleted.id
+    Recipe.objects.touch([updated.id])
+    deleted.delete()
+    ChangeLog.objects.record(ChangeLog.RECIPE, ChangeLog.DELETED,
+                             [deleted_id])
+
+    lines = [json.loads(line) for line in export_recipes(since)]
+    assert [line['id'] for line in lines] == [updated.id, deleted_id]
+    assert 'deleted' not in lines[0]
+    assert lines[1]['deleted'] is True
+
+
+def test_full_export_has_no_tombstones():
+    ChangeLog.objects.record(ChangeLog.RECIPE, ChangeLog.DELETED, [10 ** 6])
+    assert not [line for line in export_recipes()
+                if json.loads(line).get('deleted')]
@@ -0,0 +1,27 @@
+import pytest
+from django.db import connection
+
+from api.benchmarking import (benchmark_clients, large_table_scans,
+                              route_queries)
+
+pytestmark = pytest.mark.django_db
+
+
+def test_routes_issue_queries():
+    queries = route_queries(benchmark_clients())
+    routes = {route for _, route in queries.values()}
+    assert 'recipes-list|user' in routes
+
+
+@pytest.mark.skipif(connection.vendor != 'postgresql',
+                    reason='планы запросов проверяются только в PostgreSQL')
+def test_no_sequential_scans_of_large_tables():
+    """
+    Запросы эндпоинтов не читают большие таблицы последовательным
+    сканированием. Планы строятся с enable_seqscan = off, поэтому
+    результат не зависит от объёма тестовых данных.
+    """
+    problems = large_table_scans(route_queries(benchmark_clients()))
+    assert not problems, '\n'.join(
+        f'{route}: {", ".join(tables)}\n  {sql}'
+        for route, tables, sql in problems)
@@ -0,0 +1,118 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import documents
+from api.documents import rebuild_documents
+from api.views import RecipeViewSet
+from recipes.models import Favorite, Recipe, RecipeDocument, Tag
+
+User = get_user_model()
+
+LIST_QUERIES = (
+    '',
+    '?page=2',
+    '?limit=50',
+    '?shared=1',
+    '?tags=breakfast&tags=supper',
+    '?is_favorited=1',
+    '?is_in_shopping_cart=1&limit=20',
+    '?author={author}',
+    '?view=card',
+    '?fields=id,name,ingredients&limit=20',
+    '?omit=text,ingredients,author',
+    '?view=card&omit=tags&shared=1',
+)
+DETAIL_QUERIES = ('', '?view=card', '?shared=1', '?fields=id,author')
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def maintained_documents(monkeypatch):
+    """Документы поддерживаются, как при FAST_READ_SERIALIZERS."""
+    monkeypatch.setattr(documents, 'maintained', True)
+    rebuild_documents(Recipe.objects.values_list('id', flat=True))
+
+
+@pytest.fixture
+def user():
+    """Пользователь с самым длинным списком избранного."""
+    return User.objects.get(id=Favorite.objects.values('user').annotate(
+        total=Count('id')).order_by('-total', 'user')[0]['user'])
+
+
+def render(action, path, account, **kwargs):
+    """Ответ RecipeViewSet в быстром и обычном режимах."""
+    contents = []
+    for fast_read in (True, False):
+        view = RecipeViewSet.as_view({'get': action}, fast_read=fast_read)
+        request = APIRequestFactory().get(path)
+        if account is not None:
+            force_authenticate(request, user=account)
+        response = view(request, **kwargs)
+        response.render()
+        contents.append((response.status_code, response.content))
+    return contents
+
+
+def assert_same(action, path, user, **kwargs):
+    for account in (None, user):
+        fast, slow = render(action, path, account, **kwargs)
+        assert fast == slow, path
+
+
+@pytest.mark.parametrize('query', LIST_QUERIES)
+def test_list_matches_serializer(query, user):
+    author = user.follower.values_list('author', flat=True).first()
+    assert_same('list', '/api/recipes/' + query.format(
+        author=author or user.id), user)
+
+
+@pytest.mark.parametrize('query', DETAIL_QUERIES)
+def test_detail_matches_serializer(query, user):
+    recipe = Recipe.objects.order_by('id').first().id
+    assert_same('retrieve', f'/api/recipes/{recipe}/{query}', user,
+                pk=str(recipe))
+
+
+def test_missing_recipe_is_not_found(user):
+    (fast_status, _), (slow_status, _) = render(
+        'retrieve', '/api/recipes/0/', user, pk='0')
+    assert fast_status == slow_status == 404
+
+
+def test_changed_references_match_serializer(user):
+    """
+    После изменения справочников и автора и для рецепта без готового
+    документа ответы тоже совпадают.
+    """
+    recipe = Recipe.objects.order_by('id').first()
+    ingredient = recipe.ingredients.first()
+    ingredient.name += ' (изменено)'
+    ingredient.save()
+    tag = recipe.tags.first()
+    tag.name += ' (изменено)'
+    tag.save()
+    recipe.author.first_name = 'Переименован'
+    recipe.author.save()
+    Tag.objects.exclude(id=tag.id).filter(slug='dinner').delete()
+    RecipeDocument.objects.filter(
+        recipe=Recipe.objects.order_by('id')[1]).delete()
+
+    assert_same('list', '/api/recipes/?limit=50', user)
+    assert_same('retrieve', f'/api/recipes/{recipe.id}/', user,
+                pk=str(recipe.id))
+
+
+def test_documents_are_not_maintained_without_fast_read(monkeypatch):
+    monkeypatch.setattr(documents, 'maintained', False)
+    recipe = Recipe.objects.order_by('id').first()
+    body = recipe.document.body
+    tag = recipe.tags.first()
+    tag.name += ' (изменено)'
+    tag.save()
+    rebuild_documents([recipe.id])
+    recipe.document.refresh_from_db()
+    assert recipe.document.body == body
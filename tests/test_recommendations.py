@@ -0,0 +1,50 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from api.recommendations import RecommendationGraph
+from recipes.models import Recipe
+from users.models import AuthorRecommendation, Follow
+
+User = get_user_model()
+
+pytestmark = pytest.mark.django_db
+
+
+def create_user(username):
+    return User.objects.create(username=username,
+                               email=f'{username}@example.com')
+
+
+def test_filtered_out_candidates_fall_back_to_popular():
+    """
+    Единственный кандидат - сам пользователь (подписан на автора,
+    который подписан на него), поэтому предлагаются популярные авторы.
+    """
+    user = create_user('recommendations_user')
+    author = create_user('recommendations_author')
+    Recipe.objects.create(author=author, name='Рецепт', text='Описание',
+                          cooking_time=5, image='recipes/image.png')
+    Follow.objects.create(user=user, author=author)
+    Follow.objects.create(user=author, author=user)
+
+    graph = RecommendationGraph()
+    recommended = [row.author_id for row in graph.recommendations([user.id])]
+    assert recommended
+    assert user.id not in recommended
+    assert author.id not in recommended
+
+
+def test_recommendations_keep_rank_order():
+    user = create_user('ranked_user')
+    authors = [create_user(f'ranked_author_{number}') for number in range(3)]
+    for rank, author in zip((2, 3, 1), authors):
+        AuthorRecommendation.objects.create(user=user, author=author,
+                                            score=1 / rank, rank=rank)
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.get('/api/users/recommendations/?limit=2')
+    assert [row['id'] for row in response.data['results']] == [
+        authors[2].id, authors[0].id]
+    response = client.get('/api/users/recommendations/?limit=2&page=2')
+    assert [row['id'] for row in response.data['results']] == [authors[1].id]
@@ -0,0 +1,94 @@
+import io
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.parsers import FastJSONParser, MessagePackParser
+from api.renderers import FastJSONRenderer, MessagePackRenderer, msgpack
+
+EDGE_CASES = (
+    {'text': 'строка\u2028с\u2029разделителями', 'emoji': '\U0001F373'},
+    OrderedDict((('b', 1), ('a', [1, 2.5, None, True]))),
+    {'floats': [0.1, 1e16, 1e-07, -0.0, 123456789.125]},
+    {'when': timezone.now(), 'naive': datetime(2022, 9, 16, 12, 30),
+     'day': date(2022, 9, 16), 'delta': timedelta(minutes=5)},
+    {'price': Decimal('10.50'), 'id': uuid.UUID(int=1), 'lazy':
+     gettext_lazy('Ярлык')},
+    {1: 'числовой ключ', 'nested': {'list': ({'x': 1},)}},
+    [],
+    'строка',
+)
+ENDPOINTS = (
+    '/api/recipes/?limit=20',
+    '/api/recipes/?view=card&shared=1',
+    '/api/ingredients/?name=%D0%B0',
+    '/api/users/',
+)
+
+needs_msgpack = pytest.mark.skipif(
+    msgpack is None, reason='msgpack не установлен')
+
+
+def render_json(data, media_type='application/json'):
+    return JSONRenderer().render(data, media_type, {})
+
+
+def unpack(content):
+    return msgpack.unpackb(content, raw=False, strict_map_key=False)
+
+
+@pytest.mark.parametrize('data', EDGE_CASES)
+def test_fast_json_matches_json_renderer(data):
+    assert FastJSONRenderer().render(
+        data, 'application/json', {}) == render_json(data)
+
+
+def test_fast_json_keeps_indent():
+    data = {'a': [1, 2]}
+    media_type = 'application/json; indent=4'
+    assert FastJSONRenderer().render(
+        data, media_type, {}) == render_json(data, media_type)
+
+
+@needs_msgpack
+@pytest.mark.parametrize('data', EDGE_CASES)
+def test_msgpack_decodes_to_same_json(data):
+    content = MessagePackRenderer().render(data)
+    assert render_json(unpack(content)) == render_json(data)
+
+
+def test_fast_json_parser_round_trip():
+    data = {'name': 'Борщ', 'ingredients': [{'id': 1, 'amount': 2.5}]}
+    assert FastJSONParser().parse(io.BytesIO(render_json(data))) == data
+
+
+@needs_msgpack
+def test_msgpack_parser_round_trip():
+    data = {'name': 'Борщ', 'tags': [1, 2], 'cooking_time': 10}
+    assert MessagePackParser().parse(
+        io.BytesIO(MessagePackRenderer().render(data))) == data
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_api_responses_match_json_renderer(path):
+    response = APIClient().get(path)
+    assert response.status_code == 200
+    assert response.content == render_json(response.data)
+
+
+@needs_msgpack
+@pytest.mark.django_db
+@pytest.mark.parametrize('path', ENDPOINTS)
+def test_api_msgpack_matches_json(path):
+    client = APIClient()
+    packed = client.get(path, HTTP_ACCEPT=MessagePackRenderer.media_type)
+    assert packed['Content-Type'] == MessagePackRenderer.media_type
+    assert render_json(unpack(packed.content)) == client.get(path).content
@@ -0,0 +1,55 @@
+import time
+from unittest import mock
+
+import pytest
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from api.middleware import ReplicaMiddleware
+from api.routers import use_replica
+from foodgram.settings import (REPLICA_DATABASE_ALIAS, REPLICA_PIN_COOKIE,
+                               REPLICA_STICKY_SECONDS)
+
+
+@pytest.fixture
+def middleware():
+    """ReplicaMiddleware с настроенной репликой и список режимов чтения."""
+    seen = []
+
+    def view(request):
+        seen.append(use_replica.get())
+        return HttpResponse()
+
+    with mock.patch.dict(settings.DATABASES, {
+            REPLICA_DATABASE_ALIAS: settings.DATABASES['default']}):
+        yield ReplicaMiddleware(view), seen
+
+
+def read(middleware, pin=None):
+    request = RequestFactory().get('/api/recipes/')
+    if pin is not None:
+        request.COOKIES[REPLICA_PIN_COOKIE] = pin
+    middleware(request)
+
+
+def test_write_pins_client_to_primary(middleware):
+    middleware, seen = middleware
+    read(middleware)
+    assert seen == [True]
+    response = middleware(RequestFactory().post('/api/recipes/'))
+    pin = response.cookies[REPLICA_PIN_COOKIE]
+    assert pin['max-age'] == REPLICA_STICKY_SECONDS
+    read(middleware, pin.value)
+    assert seen[-1] is False
+
+
+def test_forged_or_expired_pin_is_ignored(middleware):
+    middleware, seen = middleware
+    response = middleware(RequestFactory().post('/api/recipes/'))
+    read(middleware, 'forged')
+    assert seen[-1] is True
+    with mock.patch('time.time',
+                    return_value=time.time() + REPLICA_STICKY_SECONDS + 1):
+        read(middleware, response.cookies[REPLICA_PIN_COOKIE].value)
+    assert seen[-1] is True
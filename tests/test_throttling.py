@@ -0,0 +1,56 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.core.cache import caches
+from rest_framework.test import APIRequestFactory
+
+from api.throttling import SlidingWindowThrottle
+from foodgram.settings import THROTTLE_CACHE_ALIAS
+
+
+class View:
+    throttle_scope = 'test'
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    caches[THROTTLE_CACHE_ALIAS].clear()
+    clock = Clock(6000.0)
+    monkeypatch.setattr(SlidingWindowThrottle, 'enabled', True)
+    monkeypatch.setattr(SlidingWindowThrottle, 'THROTTLE_RATES',
+                        {'test': '3/min'})
+    monkeypatch.setattr(SlidingWindowThrottle, 'timer', clock)
+    return clock
+
+
+def allow():
+    request = APIRequestFactory().get('/api/recipes/')
+    request.user = None
+    throttle = SlidingWindowThrottle()
+    return throttle.allow_request(request, View()), throttle
+
+
+def test_limit_and_denied_requests_are_not_counted(clock):
+    assert [allow()[0] for _ in range(5)] == [True] * 3 + [False] * 2
+    allowed, throttle = allow()
+    assert not allowed
+    assert 0 < throttle.wait() <= 60
+    clock.now += 60
+    # Предыдущее окно ещё учитывается целиком в начале нового.
+    assert not allow()[0]
+    clock.now += 30
+    assert allow()[0]
+
+
+def test_concurrent_requests_do_not_exceed_limit(clock):
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(lambda _: allow()[0], range(40)))
+    assert results.count(True) == 3